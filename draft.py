@@ -9,12 +9,11 @@ from typing import Awaitable
 from lmmule.rag import Rag, OllamaEmbedding
 from lmmule.mule import Mule
 from lmmule.examples.allmules import *
-import lmmule.mule
 
 
 async def main():
-    Mule.init_args()
-    model_name = lmmule.mule.args.model
+    args = Mule.init_args()
+    model_name = args.model
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+import logging
+import importlib
+
+# Applications opt in with lmmule.log.configure()
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Public names are imported on first access (PEP 562), so `import lmmule` does
+# not load aiohttp, SQLAlchemy or the scraping stack until a feature needs them
+_LAZY = {
+    "Mule": "lmmule.mule",
+    "ALLOWED_TAG_DEFAULT": "lmmule.mule",
+    "EmbeddingProvider": "lmmule.embeddings",
+    "OllamaEmbedding": "lmmule.embeddings",
+    "OpenRouterEmbedding": "lmmule.embeddings",
+    "Rag": "lmmule.rag",
+    "JobQueue": "lmmule.jobs",
+    "Worker": "lmmule.jobs",
+    "Checkpoint": "lmmule.checkpoint",
+    "MuleServer": "lmmule.server",
+    "LIMITER": "lmmule.ratelimit",
+    "TELEMETRY": "lmmule.telemetry",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
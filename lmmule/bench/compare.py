@@ -0,0 +1,77 @@
+import sys
+import json
+import argparse
+
+# metric -> True if bigger is better
+METRICS = {
+    "throughput_per_s": True,
+    "llm_calls_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "llm_p50_ms": False,
+    "llm_p99_ms": False,
+    "ttft_p50_ms": False,
+}
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, dict]:
+    """{"rag": {"search": {...}}} -> {"rag.search": {...}}"""
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and "count" in value:
+            flat[prefix + name] = value
+        elif isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+    return flat
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple[list[str], int]:
+    base, new = flatten(base["results"]), flatten(new["results"])
+    lines, regressions = [], 0
+    for suite in sorted(base.keys() & new.keys()):
+        for metric, higher_is_better in METRICS.items():
+            old, cur = base[suite].get(metric), new[suite].get(metric)
+            if old is None or cur is None:
+                continue
+            change = (cur - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif -worse > threshold:
+                flag = "  improved"
+            lines.append(
+                f"{suite:<20} {metric:<18} {old:>12.3f} {cur:>12.3f} {change:>+8.1%}{flag}"
+            )
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two lmmule.bench.run outputs")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change counted as a regression",
+    )
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base {base['meta'].get('commit')}  new {new['meta'].get('commit')}")
+    print(f"{'suite':<20} {'metric':<18} {'base':>12} {'new':>12} {'change':>8}")
+    lines, regressions = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{regressions} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
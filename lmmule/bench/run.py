@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import platform
+import argparse
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+
+import lmmule.mule
+from lmmule.mule import Mule, ALLOWED_TAG_DEFAULT
+from lmmule.telemetry import TELEMETRY
+from lmmule.ratelimit import LIMITER
+from lmmule.examples.allmules import Thinker, Researcher
+from lmmule.bench.stubs import FIXTURES_DIR
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarise(latencies: list[float], wall: float, **extra) -> dict:
+    return {
+        "count": len(latencies),
+        "wall_s": round(wall, 4),
+        "throughput_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "mean_ms": (
+            round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0
+        ),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        **extra,
+    }
+
+
+def span_latencies(name: str) -> list[float]:
+    return [s.attributes["duration_s"] for s in TELEMETRY.spans if s.name == name]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args) -> tuple[subprocess.Popen, str]:
+    """The stub runs in its own process so it doesn't share the event loop
+    being measured."""
+    port = free_port()
+    cmd = [
+        sys.executable,
+        "-m",
+        "lmmule.bench.stubs",
+        "--port",
+        str(port),
+        "--latency",
+        str(args.latency),
+        "--tokens-per-s",
+        str(args.tokens_per_s),
+        "--output-tokens",
+        str(args.output_tokens),
+        "--embed-dim",
+        str(args.embed_dim),
+    ]
+    if args.replay:
+        cmd += ["--replay", args.replay]
+    if args.record:
+        cmd += [
+            "--record",
+            args.record,
+            "--ollama-upstream",
+            args.ollama_upstream,
+            "--openrouter-upstream",
+            args.openrouter_upstream,
+        ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    sys.exit("stub server did not start")
+
+
+async def bench_fanout(args, stream: bool) -> dict:
+    """Thinkers over N sources feeding one Researcher, as in agentic_bench."""
+    on_token = (lambda token: None) if stream else None
+    flow_latencies = []
+    TELEMETRY.reset()
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        t0 = time.perf_counter()
+        thinkers = {
+            f"{j}": Thinker(
+                f"bench-{i}-{j}",
+                model_name=args.model,
+                base_prompt=f"take careful notes on source {i}-{j}",
+                on_token=on_token,
+            )()
+            for j in range(args.fanout)
+        }
+        await Researcher(
+            f"bench-{i}-researcher",
+            model_name=args.model,
+            base_prompt="summarise these notes\n\n{}",
+            on_token=on_token,
+        )(**thinkers)
+        flow_latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+
+    calls = span_latencies("llm.chat")
+    ttft = [
+        s.attributes["ttft_s"]
+        for s in TELEMETRY.spans
+        if s.name == "llm.chat" and "ttft_s" in s.attributes
+    ]
+    return summarise(
+        flow_latencies,
+        wall,
+        fanout=args.fanout,
+        llm_calls=len(calls),
+        llm_calls_per_s=round(len(calls) / wall, 3),
+        llm_p50_ms=round(percentile(calls, 50) * 1000, 3),
+        llm_p99_ms=round(percentile(calls, 99) * 1000, 3),
+        ttft_p50_ms=round(percentile(ttft, 50) * 1000, 3) if ttft else None,
+        errors=sum(1 for s in TELEMETRY.spans if s.error),
+    )
+
+
+async def bench_scrape(args, base_url: str) -> dict:
+    pages = sorted(f for f in os.listdir(FIXTURES_DIR) if f.endswith(".html"))
+    TELEMETRY.reset()
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        results = await asyncio.gather(
+            *(
+                Mule.scrape_page(page, f"{base_url}/pages/{page}", ALLOWED_TAG_DEFAULT)
+                for page in pages
+            )
+        )
+    wall = time.perf_counter() - start
+    return summarise(
+        span_latencies("scrape"),
+        wall,
+        pages=len(pages),
+        content_chars=sum(len(r.get("content", "")) for r in results),
+    )
+
+
+async def bench_embed(args) -> dict:
+    from lmmule.embeddings import OllamaEmbedding
+
+    embedder = OllamaEmbedding(model_name=args.embed_model, embed_dim=args.embed_dim)
+    texts = [
+        f"benchmark document {i} about flash index files" for i in range(args.batch)
+    ]
+    TELEMETRY.reset()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(embedder.batch_embed(texts) for _ in range(args.iterations * 4))
+    )
+    wall = time.perf_counter() - start
+    return summarise(span_latencies("embed"), wall, batch=args.batch)
+
+
+async def bench_rag(args) -> dict:
+    from lmmule.rag import Rag, OllamaEmbedding
+
+    rag = await Rag(
+        postgres_url=args.postgres_url,
+        embedder=OllamaEmbedding(model_name=args.embed_model, embed_dim=args.embed_dim),
+        echo=False,
+    ).init_db()
+    namespace = f"bench-{os.getpid()}"
+    TELEMETRY.reset()
+    try:
+        source_id = await rag.upsert_source("lmmule-bench", type="bench")
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            await rag.upsert_documents(
+                [f"bench doc {i}-{j} on wear leveling" for j in range(args.batch)],
+                source_id,
+                namespace=namespace,
+            )
+        upsert_wall = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                rag.search(f"wear leveling {i}", namespace=namespace, threshold=2)
+                for i in range(args.iterations * 4)
+            )
+        )
+        search_wall = time.perf_counter() - start
+    finally:
+        await rag.close()
+    return {
+        "upsert": summarise(span_latencies("rag.upsert_documents"), upsert_wall),
+        "search": summarise(span_latencies("rag.search"), search_wall),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                cwd=os.path.dirname(__file__),
+            ).stdout.strip()
+            or None
+        )
+    except OSError:
+        return None
+
+
+async def run(args, base_url: str) -> dict:
+    lmmule.mule.OLLAMA_URL = f"{base_url}/ollama"
+    lmmule.mule.OPENROUTER_URL = f"{base_url}/openrouter"
+    lmmule.mule.USE_REMOTE = args.remote
+    if not args.record:
+        os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+        # measure the client, not OpenRouter's free tier limits
+        LIMITER.configure("openrouter", args.model, rate=1e6, burst=1e6)
+    TELEMETRY.enabled = True
+
+    suites = set(args.suites)
+    results = {}
+    await Mule.open_session()
+    try:
+        if "fanout" in suites:
+            results["fanout"] = await bench_fanout(args, stream=False)
+        if "fanout_stream" in suites:
+            results["fanout_stream"] = await bench_fanout(args, stream=True)
+        if "scrape" in suites:
+            results["scrape"] = await bench_scrape(args, base_url)
+        if "embed" in suites:
+            results["embed"] = await bench_embed(args)
+        if "rag" in suites and args.postgres_url:
+            results["rag"] = await bench_rag(args)
+        if "startup" in suites:
+            from lmmule.bench.startup import bench_startup
+
+            results["startup"] = await bench_startup(args, base_url)
+    finally:
+        await Mule.close_session()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline lmmule benchmarks")
+    parser.add_argument(
+        "--suites",
+        nargs="+",
+        default=["fanout", "fanout_stream", "scrape", "embed", "rag", "startup"],
+        help="rag only runs with --postgres-url",
+    )
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=16, help="Texts per embed/upsert")
+    parser.add_argument("--model", default="bench-model")
+    parser.add_argument("--embed-model", default="bench-embed")
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument(
+        "--startup-runs",
+        type=int,
+        default=10,
+        help="Fresh interpreters per startup case",
+    )
+    parser.add_argument(
+        "--remote", action="store_true", help="Exercise the OpenRouter path"
+    )
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-s", type=float, default=200)
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--replay", help="JSONL recorded with --record")
+    parser.add_argument(
+        "--record",
+        help="Proxy the bench's calls to the real providers, appending them to this "
+        "JSONL for later --replay with the same suites and --model",
+    )
+    parser.add_argument("--ollama-upstream", default="http://localhost:11434")
+    parser.add_argument("--openrouter-upstream", default="https://openrouter.ai/api/v1")
+    parser.add_argument(
+        "--stub-url", help="Use an already running lmmule.bench.stubs server"
+    )
+    parser.add_argument("--postgres-url", default=os.environ.get("LMMULE_POSTGRES_URL"))
+    parser.add_argument(
+        "-o", "--output", help="Write JSON results here instead of stdout"
+    )
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.stub_url and (args.record or args.replay):
+        parser.error("pass --record/--replay to the running stub instead")
+
+    proc, base_url = (
+        (None, args.stub_url.rstrip("/")) if args.stub_url else start_stub(args)
+    )
+    try:
+        results = asyncio.run(run(args, base_url))
+        with urllib.request.urlopen(f"{base_url}/health") as resp:
+            stub = json.load(resp)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                k: v
+                for k, v in vars(args).items()
+                if k not in ("output", "postgres_url")
+            },
+            "stub": stub,
+        },
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+    if args.replay and not stub["replay_hits"]:
+        # the replay key includes the model, so a mismatched --model misses
+        sys.exit(
+            f"--replay matched none of {stub['replay_misses']} calls; "
+            "check --model matches the recording"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import asyncio
+
+from lmmule.bench.run import percentile, summarise
+
+MODULES = [
+    "lmmule",
+    "lmmule.mule",
+    "lmmule.embeddings",
+    "lmmule.rag",
+    "lmmule.jobs",
+    "lmmule.server",
+]
+
+IMPORT_CHILD = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+FIRST_CALL_CHILD = """
+import time
+t0 = time.perf_counter()
+import asyncio
+import lmmule.mule
+from lmmule.examples.allmules import Thinker
+t1 = time.perf_counter()
+lmmule.mule.USE_REMOTE = {remote}
+asyncio.run(Thinker("startup", model_name={model!r}, base_prompt="hello")())
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+async def child(code: str, env: dict) -> tuple[float, list[float]]:
+    """Wall time of a fresh interpreter running `code`, and the floats it prints."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-c",
+        code,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    out, _ = await proc.communicate()
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"startup child exited {proc.returncode}")
+    return wall, [float(v) for v in out.split()]
+
+
+async def bench_startup(args, base_url: str) -> dict:
+    """Cold `import` per entry point and time to first Mule call, each in a
+    new interpreter so nothing is already in sys.modules."""
+    env = {
+        **os.environ,
+        "LMMULE_OLLAMA_URL": f"{base_url}/ollama",
+        "LMMULE_OPENROUTER_URL": f"{base_url}/openrouter",
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "bench"),
+    }
+    env.pop("LMMULE_RUN_ID", None)
+    results = {}
+
+    for module in MODULES:
+        imports, walls = [], []
+        for _ in range(args.startup_runs):
+            wall, (elapsed,) = await child(IMPORT_CHILD.format(module=module), env)
+            imports.append(elapsed)
+            walls.append(wall)
+        results[f"import_{module.replace('.', '_')}"] = summarise(
+            imports,
+            sum(walls),
+            process_p50_ms=round(percentile(walls, 50) * 1000, 3),
+        )
+
+    imports, calls, walls = [], [], []
+    for _ in range(args.startup_runs):
+        wall, (imported, called) = await child(
+            FIRST_CALL_CHILD.format(remote=args.remote, model=args.model), env
+        )
+        imports.append(imported)
+        calls.append(called)
+        walls.append(wall)
+    # the child's own clock only starts after the interpreter is up
+    results["first_call"] = summarise(
+        walls,
+        sum(walls),
+        import_p50_ms=round(percentile(imports, 50) * 1000, 3),
+        call_p50_ms=round(percentile(calls, 50) * 1000, 3),
+    )
+    return results
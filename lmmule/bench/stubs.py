@@ -0,0 +1,350 @@
+import os
+import json
+import math
+import random
+import asyncio
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+
+from aiohttp import web, ClientSession
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def replay_key(path: str, body: dict) -> str:
+    body = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+    return hashlib.sha256(json.dumps([path, body], sort_keys=True).encode()).hexdigest()
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    vec = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1
+    return [v / norm for v in vec]
+
+
+@dataclass
+class StubLLM:
+    """Local stand-in for the Ollama and OpenRouter chat/embed endpoints and
+    for the web pages scrape_page fetches.
+
+    Responses are synthesised, or replayed from a JSONL recording, and paced by
+    `latency` (time to first token) and `tokens_per_s`. With `upstream` set it
+    instead proxies to the real providers and appends what it sees to `record`.
+    """
+
+    latency: float = 0.05
+    tokens_per_s: float = 200
+    output_tokens: int = 64
+    embed_latency: float = 0.01
+    embed_dim: int = 768
+    page_latency: float = 0.0
+    replay: str | None = None
+    record: str | None = None
+    # {"ollama": "http://localhost:11434", "openrouter": "https://openrouter.ai/api/v1"}
+    upstream: dict = field(default_factory=dict)
+    fixtures_dir: str = FIXTURES_DIR
+
+    def __post_init__(self):
+        self.recordings: dict[str, dict] = {}
+        if self.replay:
+            with open(self.replay) as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.recordings[item["key"]] = item["response"]
+        self.requests = 0
+        self.replay_hits = 0
+        self.replay_misses = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024**2)
+        app.add_routes(
+            [
+                web.post("/ollama/api/chat", self.ollama_chat),
+                web.post("/ollama/api/embed", self.ollama_embed),
+                web.post("/openrouter/chat/completions", self.openrouter_chat),
+                web.post("/openrouter/embeddings", self.openrouter_embed),
+                web.get("/pages/{name}", self.page),
+                web.get("/health", self.health),
+            ]
+        )
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+    async def on_cleanup(self, app):
+        if hasattr(self, "session"):
+            await self.session.close()
+
+    # Helpers
+
+    def tokens(self, seed: str) -> list[str]:
+        rng = random.Random(seed)
+        words = ["lorem", "ipsum", "dolor", "sit", "amet", "mule", "agent", "index"]
+        return [f"{rng.choice(words)} " for _ in range(self.output_tokens)]
+
+    def split(self, content: str) -> list[str]:
+        """Replayed text, chopped into roughly word sized tokens for pacing."""
+        words = content.split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+    async def pace(self, n_tokens: int):
+        await asyncio.sleep(self.latency + n_tokens / self.tokens_per_s)
+
+    async def proxy(
+        self, request, provider: str, path: str, body: dict
+    ) -> tuple[dict, int]:
+        """Forwards a non-streamed call upstream and records it. Streamed chat
+        calls are re-streamed from the response like a replay."""
+        if not hasattr(self, "session"):
+            self.session = ClientSession()
+        headers = {
+            k: v
+            for k, v in request.headers.items()
+            if k.lower() in ("authorization", "content-type")
+        }
+        body = {k: v for k, v in body.items() if k != "stream_options"}
+        body["stream"] = False
+        async with self.session.post(
+            f"{self.upstream[provider]}{path}", json=body, headers=headers
+        ) as resp:
+            data = await resp.json(content_type=None)
+            if resp.status == 200:
+                with open(self.record, "a") as f:
+                    key = replay_key(f"{provider}{path}", body)
+                    f.write(json.dumps({"key": key, "response": data}) + "\n")
+            return data, resp.status
+
+    def recorded(self, provider: str, path: str, body: dict) -> dict | None:
+        """A miss falls back to synthetic tokens, so misses are counted and
+        reported on /health."""
+        if not self.replay:
+            return None
+        response = self.recordings.get(replay_key(f"{provider}{path}", body))
+        if response is None:
+            self.replay_misses += 1
+        else:
+            self.replay_hits += 1
+        return response
+
+    async def stream(self, request, chunks, content_type: str):
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        await asyncio.sleep(self.latency)
+        for chunk in chunks:
+            await response.write(chunk)
+            await asyncio.sleep(1 / self.tokens_per_s)
+        await response.write_eof()
+        return response
+
+    # Ollama
+
+    async def ollama_chat(self, request):
+        self.requests += 1
+        body = await request.json()
+        prompt = json.dumps(body.get("messages", []))
+        if "ollama" in self.upstream:
+            recorded, status = await self.proxy(request, "ollama", "/api/chat", body)
+            if status != 200:
+                return web.json_response(recorded, status=status)
+        else:
+            recorded = self.recorded("ollama", "/api/chat", body)
+        tokens = (
+            self.split(recorded["message"]["content"])
+            if recorded
+            else self.tokens(prompt)
+        )
+        stats = {
+            "model": body.get("model"),
+            "done": True,
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": int(self.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) / self.tokens_per_s * 1e9),
+        }
+
+        if body.get("stream", True):
+            lines = [
+                json.dumps(
+                    {"message": {"role": "assistant", "content": t}, "done": False}
+                )
+                + "\n"
+                for t in tokens
+            ]
+            lines.append(
+                json.dumps({**stats, "message": {"role": "assistant", "content": ""}})
+                + "\n"
+            )
+            return await self.stream(
+                request, [line.encode() for line in lines], "application/x-ndjson"
+            )
+
+        await self.pace(len(tokens))
+        return web.json_response(
+            {**stats, "message": {"role": "assistant", "content": "".join(tokens)}}
+        )
+
+    async def ollama_embed(self, request):
+        self.requests += 1
+        body = await request.json()
+        if "ollama" in self.upstream:
+            data, status = await self.proxy(request, "ollama", "/api/embed", body)
+            return web.json_response(data, status=status)
+
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(self.embed_latency)
+        return web.json_response(
+            {
+                "model": body.get("model"),
+                "embeddings": [fake_embedding(t, self.embed_dim) for t in texts],
+                "load_duration": 0,
+                "prompt_eval_count": sum(len(t.split()) for t in texts),
+            }
+        )
+
+    # OpenRouter
+
+    async def openrouter_chat(self, request):
+        self.requests += 1
+        body = await request.json()
+        prompt = json.dumps(body.get("messages", []))
+        if "openrouter" in self.upstream:
+            recorded, status = await self.proxy(
+                request, "openrouter", "/chat/completions", body
+            )
+            if status != 200:
+                return web.json_response(recorded, status=status)
+        else:
+            recorded = self.recorded("openrouter", "/chat/completions", body)
+        tokens = (
+            self.split(recorded["choices"][0]["message"]["content"])
+            if recorded
+            else self.tokens(prompt)
+        )
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt.split()) + len(tokens),
+        }
+
+        if body.get("stream"):
+            events = [
+                f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': t}}]})}\n\n"
+                for t in tokens
+            ]
+            events.append(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+            events.append("data: [DONE]\n\n")
+            return await self.stream(
+                request, [e.encode() for e in events], "text/event-stream"
+            )
+
+        await self.pace(len(tokens))
+        return web.json_response(
+            {
+                "id": f"gen-{self.requests}",
+                "model": body.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def openrouter_embed(self, request):
+        self.requests += 1
+        body = await request.json()
+        if "openrouter" in self.upstream:
+            data, status = await self.proxy(request, "openrouter", "/embeddings", body)
+            return web.json_response(data, status=status)
+
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(self.embed_latency)
+        return web.json_response(
+            {
+                "object": "list",
+                "model": body.get("model"),
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": fake_embedding(t, self.embed_dim),
+                    }
+                    for i, t in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": sum(len(t.split()) for t in texts)},
+            }
+        )
+
+    # Web
+
+    async def page(self, request):
+        self.requests += 1
+        name = os.path.basename(request.match_info["name"])
+        path = os.path.join(self.fixtures_dir, name)
+        if not os.path.isfile(path):
+            raise web.HTTPNotFound()
+        await asyncio.sleep(self.page_latency)
+        return web.FileResponse(path, headers={"Content-Type": "text/html"})
+
+    async def health(self, request):
+        return web.json_response(
+            {
+                "status": "ok",
+                "requests": self.requests,
+                "replay_hits": self.replay_hits,
+                "replay_misses": self.replay_misses,
+            }
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in LLM and web endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds to first token"
+    )
+    parser.add_argument("--tokens-per-s", type=float, default=200)
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--replay", help="JSONL recording to answer from")
+    parser.add_argument(
+        "--record", help="Proxy to the real providers, appending to this JSONL"
+    )
+    parser.add_argument("--ollama-upstream", default="http://localhost:11434")
+    parser.add_argument("--openrouter-upstream", default="https://openrouter.ai/api/v1")
+    args = parser.parse_args()
+
+    stub = StubLLM(
+        latency=args.latency,
+        tokens_per_s=args.tokens_per_s,
+        output_tokens=args.output_tokens,
+        embed_latency=args.embed_latency,
+        embed_dim=args.embed_dim,
+        page_latency=args.page_latency,
+        replay=args.replay,
+        record=args.record,
+        upstream=(
+            {"ollama": args.ollama_upstream, "openrouter": args.openrouter_upstream}
+            if args.record
+            else {}
+        ),
+    )
+    print(
+        f"LMMULE_OLLAMA_URL=http://{args.host}:{args.port}/ollama "
+        f"LMMULE_OPENROUTER_URL=http://{args.host}:{args.port}/openrouter",
+        flush=True,
+    )
+    web.run_app(stub.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
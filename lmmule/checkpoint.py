@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime
+
+CHECKPOINT_DIR = os.environ.get(
+    "LMMULE_CHECKPOINT_DIR", os.path.expanduser("~/.cache/lmmule")
+)
+
+
+def _hash(obj) -> str:
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _write_json(path: str, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+@dataclass
+class Checkpoint:
+    """Content addressed store of Mule results.
+
+    Results live under nodes/ keyed by the node's identity and the hashes of its
+    upstream results, so any run sharing the store reuses unchanged nodes and
+    only re-executes what a change invalidated. runs/ records which nodes each
+    run touched and how to re-launch it."""
+
+    run_id: str = field(
+        default_factory=lambda: os.environ.get("LMMULE_RUN_ID")
+        or datetime.now().strftime("%Y%m%d-%H%M%S-") + os.urandom(3).hex()
+    )
+    root: str = CHECKPOINT_DIR
+
+    def __post_init__(self):
+        os.makedirs(os.path.join(self.root, "nodes"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "runs"), exist_ok=True)
+        self.manifest = _read_json(self.run_path(self.root, self.run_id)) or {
+            "run_id": self.run_id,
+            "argv": sys.argv,
+            "cwd": os.getcwd(),
+            "created_at": time.time(),
+            "nodes": {},
+        }
+        self.manifest["updated_at"] = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def run_path(cls, root: str, run_id: str) -> str:
+        return os.path.join(root, "runs", f"{run_id}.json")
+
+    @classmethod
+    def node_path(cls, root: str, key: str) -> str:
+        return os.path.join(root, "nodes", f"{key}.json")
+
+    @classmethod
+    def node_key(cls, mule, upstream: dict[str, list[dict]]) -> str:
+        """Called before the Mule runs, so chat_history is whatever it was
+        seeded with."""
+        import lmmule.mule
+
+        cls_ = type(mule)
+        return _hash(
+            {
+                "mule": f"{cls_.__module__}:{cls_.__qualname__}",
+                "provider": "openrouter" if lmmule.mule.USE_REMOTE else "ollama",
+                "model_name": mule.model_name,
+                "chat_history": _hash(mule.chat_history),
+                "base_prompt": mule.base_prompt,
+                "output_format": mule.output_format,
+                "upstream": {name: _hash(r) for name, r in upstream.items()},
+            }
+        )
+
+    def get(self, key: str, mule) -> list[dict] | None:
+        node = _read_json(self.node_path(self.root, key))
+        if node is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._record(key, mule, reused=True)
+        return node["result"]
+
+    def put(self, key: str, mule, result: list[dict]):
+        _write_json(
+            self.node_path(self.root, key),
+            {
+                "key": key,
+                "mule": f"{type(mule).__module__}:{type(mule).__qualname__}",
+                "mule_name": mule.mule_name,
+                "model_name": mule.model_name,
+                "created_at": time.time(),
+                "result": result,
+            },
+        )
+        self._record(key, mule, reused=False)
+
+    def _record(self, key: str, mule, reused: bool):
+        self.manifest["nodes"][mule.mule_name] = {"key": key, "reused": reused}
+        self.manifest["updated_at"] = time.time()
+        _write_json(self.run_path(self.root, self.run_id), self.manifest)
+
+    @classmethod
+    def runs(cls, root: str = CHECKPOINT_DIR) -> list[dict]:
+        runs_dir = os.path.join(root, "runs")
+        if not os.path.isdir(runs_dir):
+            return []
+        return sorted(
+            (
+                run
+                for name in os.listdir(runs_dir)
+                if name.endswith(".json")
+                and (run := _read_json(os.path.join(runs_dir, name)))
+            ),
+            key=lambda run: run["created_at"],
+        )
+
+    @classmethod
+    def prune(
+        cls,
+        root: str = CHECKPOINT_DIR,
+        run_ids: list[str] | None = None,
+        older_than: float | None = None,
+    ) -> tuple[int, int]:
+        """Drop the given runs and/or runs not updated for `older_than` seconds,
+        then delete nodes no remaining run refers to."""
+        removed_runs = 0
+        for run in cls.runs(root):
+            if (run_ids and run["run_id"] in run_ids) or (
+                older_than is not None
+                and time.time() - run.get("updated_at", 0) > older_than
+            ):
+                os.remove(cls.run_path(root, run["run_id"]))
+                removed_runs += 1
+
+        keep = {n["key"] for run in cls.runs(root) for n in run["nodes"].values()}
+        removed_nodes = 0
+        nodes_dir = os.path.join(root, "nodes")
+        for name in os.listdir(nodes_dir) if os.path.isdir(nodes_dir) else []:
+            if name.removesuffix(".json") not in keep:
+                os.remove(os.path.join(nodes_dir, name))
+                removed_nodes += 1
+        return removed_runs, removed_nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and manage stored runs")
+    parser.add_argument("--root", default=CHECKPOINT_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="List stored runs")
+    show = sub.add_parser("show", help="Show the nodes of a run")
+    show.add_argument("run_id")
+    show.add_argument("--results", action="store_true", help="Print node outputs")
+    prune = sub.add_parser("prune", help="Delete runs and unreferenced results")
+    prune.add_argument("run_ids", nargs="*")
+    prune.add_argument("--older-than", type=float, help="Age in days")
+    prune.add_argument("--all", action="store_true")
+    resume = sub.add_parser("resume", help="Re-run a flow, reusing stored results")
+    resume.add_argument("run_id")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for run in Checkpoint.runs(args.root):
+            created = datetime.fromtimestamp(run["created_at"])
+            print(
+                f"{run['run_id']}  {created:%Y-%m-%d %H:%M}  "
+                f"{len(run['nodes'])} nodes  {' '.join(run['argv'])}"
+            )
+
+    elif args.cmd == "show":
+        run = _read_json(Checkpoint.run_path(args.root, args.run_id))
+        if run is None:
+            sys.exit(f"No run {args.run_id}")
+        print(f"{run['run_id']}: {' '.join(run['argv'])} (in {run['cwd']})")
+        for name, node in run["nodes"].items():
+            print(
+                f"  {name}  {node['key'][:12]}  {'reused' if node['reused'] else 'ran'}"
+            )
+            stored = _read_json(Checkpoint.node_path(args.root, node["key"]))
+            if args.results and stored:
+                print(f"    {stored['result'][-1]['content']}")
+
+    elif args.cmd == "prune":
+        if not (args.run_ids or args.older_than is not None or args.all):
+            sys.exit("Give run ids, --older-than or --all")
+        removed_runs, removed_nodes = Checkpoint.prune(
+            args.root,
+            run_ids=args.run_ids,
+            older_than=(
+                0
+                if args.all
+                else (args.older_than * 86400 if args.older_than is not None else None)
+            ),
+        )
+        print(f"Removed {removed_runs} runs and {removed_nodes} results")
+
+    elif args.cmd == "resume":
+        run = _read_json(Checkpoint.run_path(args.root, args.run_id))
+        if run is None:
+            sys.exit(f"No run {args.run_id}")
+        os.chdir(run["cwd"])
+        env = {
+            **os.environ,
+            "LMMULE_RUN_ID": run["run_id"],
+            "LMMULE_CHECKPOINT_DIR": args.root,
+        }
+        os.execvpe(sys.executable, [sys.executable, *run["argv"]], env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import lmmule.mule
+from lmmule.mule import Mule
+from lmmule.telemetry import TELEMETRY
+
+
+@dataclass
+class EmbeddingProvider(ABC):
+    model_name: str
+    embed_dim: int
+
+    @abstractmethod
+    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
+        pass
+
+
+@dataclass
+class OllamaEmbedding(EmbeddingProvider):
+    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
+        with TELEMETRY.span(
+            "embed", provider="ollama", model=self.model_name, texts=len(texts)
+        ) as span:
+            resp = await Mule.request(
+                "POST",
+                f"{lmmule.mule.OLLAMA_URL}/api/embed",
+                payload={"model": self.model_name, "input": texts},
+            )
+            if not resp.get("embeddings"):
+                span.fail(resp.get("error"))
+            if "prompt_eval_count" in resp:
+                span.set(tokens_in=resp["prompt_eval_count"])
+            if resp.get("load_duration"):
+                span.set(load_s=resp["load_duration"] / 1e9)
+        return resp["embeddings"] if resp.get("embeddings") else [[]]
+
+
+@dataclass
+class OpenRouterEmbedding(EmbeddingProvider):
+    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
+        openrouter_key = Mule.get_openrouter_key()
+        with TELEMETRY.span(
+            "embed", provider="openrouter", model=self.model_name, texts=len(texts)
+        ) as span:
+            resp = await Mule.request(
+                "POST",
+                f"{lmmule.mule.OPENROUTER_URL}/embeddings",
+                payload={"model": self.model_name, "input": texts},
+                headers={
+                    "Authorization": f"Bearer {openrouter_key}",
+                    "Content-Type": "application/json",
+                },
+                limit=("openrouter", self.model_name),
+            )
+            # OpenAI compatible shape: {"data": [{"embedding": [...], "index": 0}]}
+            embeddings = [
+                item["embedding"]
+                for item in sorted(resp.get("data") or [], key=lambda d: d["index"])
+            ] or resp.get("embeddings")
+            if not embeddings:
+                span.fail(resp.get("error"))
+            if usage := resp.get("usage"):
+                span.set(tokens_in=usage.get("prompt_tokens", 0))
+        return embeddings if embeddings else [[]]
@@ -7,7 +7,6 @@ from typing import Awaitable
 
 from lmmule.mule import Mule
 from lmmule.examples.allmules import Thinker, Researcher
-import lmmule.mule
 
 from rich.console import Console
 from rich.markdown import Markdown
@@ -16,8 +15,8 @@ console = Console()
 
 
 async def main():
-    Mule.init_args()
-    model_name = lmmule.mule.args.model
+    args = Mule.init_args()
+    model_name = args.model
     topics = "index file DB in C for mcu application"
 
     sources = await Mule.websearch(topics, num_res=8)
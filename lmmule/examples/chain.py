@@ -3,12 +3,11 @@ import json
 
 from lmmule.mule import Mule
 from lmmule.examples.allmules import *
-import lmmule.mule
 
 
 async def main():
-    Mule.init_args()
-    model_name = lmmule.mule.args.model
+    args = Mule.init_args()
+    model_name = args.model
 
     t1 = Thinker(
         "mule12-eve",
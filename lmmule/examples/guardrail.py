@@ -7,8 +7,8 @@ import lmmule.mule
 
 
 async def main():
-    Mule.init_args()
-    model_name = lmmule.mule.args.model
+    args = Mule.init_args()
+    model_name = args.model
 
     messages = [
         "what is the meaning of life",
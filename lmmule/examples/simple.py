@@ -4,12 +4,11 @@ import argparse
 
 from lmmule.mule import Mule
 from lmmule.examples.allmules import Thinker, Critic
-import lmmule.mule
 
 
 async def main():
-    Mule.init_args()
-    model_name = lmmule.mule.args.model
+    args = Mule.init_args()
+    model_name = args.model
 
     task1 = Thinker(
         "mule1-bob",
@@ -0,0 +1,128 @@
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+# Attributes every LogRecord has; anything else came in through `extra`
+RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: logging.handlers.QueueListener | None = None
+_handler: logging.Handler | None = None
+
+
+def truncate(value, max_chars: int, max_items: int = 20):
+    """Bound the size of a logged value, keeping its head and tail."""
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return f"{value[:max_chars]}...[+{len(value) - max_chars} chars]"
+    if isinstance(value, dict):
+        return {k: truncate(v, max_chars, max_items) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > max_items:
+            head, tail = value[: max_items // 2], value[-(max_items // 2) :]
+            value = [*head, f"...[+{len(value) - len(head) - len(tail)} items]", *tail]
+        return [truncate(v, max_chars, max_items) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, max_field_chars: int = 2000):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage(), self.max_field_chars),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS:
+                entry[key] = truncate(value, self.max_field_chars)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread unformatted, so message formatting
+    and JSON encoding happen off the event loop. Never blocks: records are
+    dropped when the queue is full, and sub-WARNING records can be sampled."""
+
+    def __init__(self, q: queue.Queue, sample_rate: float = 1.0):
+        super().__init__(q)
+        self.sample_rate = sample_rate
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord):
+        if (
+            self.sample_rate < 1
+            and record.levelno < logging.WARNING
+            and random.random() >= self.sample_rate
+        ):
+            return
+        super().emit(record)
+
+
+def configure(
+    path: str = "/tmp/mule.log",
+    level: int = logging.INFO,
+    max_bytes: int = 10 * 1024**2,
+    backups: int = 3,
+    max_field_chars: int = 2000,
+    sample_rate: float = 1.0,
+    queue_size: int = 10000,
+    logger: str = "lmmule",
+) -> logging.handlers.QueueListener:
+    """Send lmmule logs as JSON lines to a size-rotated file, written from a
+    background thread. Call once from the application; lmmule configures
+    nothing at import."""
+    global _listener, _handler
+    shutdown()
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(JsonFormatter(max_field_chars))
+
+    q: queue.Queue = queue.Queue(queue_size)
+    _handler = LazyQueueHandler(q, sample_rate)
+    _listener = logging.handlers.QueueListener(q, file_handler)
+    _listener.start()
+
+    log = logging.getLogger(logger)
+    log.setLevel(level)
+    log.addHandler(_handler)
+    atexit.register(shutdown)
+    return _listener
+
+
+def shutdown():
+    """Flush queued records and detach the pipeline."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _handler is not None:
+        for log in [
+            logging.getLogger("lmmule"),
+            *logging.Logger.manager.loggerDict.values(),
+        ]:
+            if isinstance(log, logging.Logger) and _handler in log.handlers:
+                log.removeHandler(_handler)
+        _handler = None
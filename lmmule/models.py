@@ -1,6 +1,8 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy import (
+    JSON,
     Computed,
+    Float,
     Text,
     String,
     ForeignKey,
@@ -42,3 +44,38 @@ class Document(Base):
     __table_args__ = (
         UniqueConstraint("text_hash", "namespace", name="uq_text_hash_namespace"),
     )
+
+
+TaskJSON = JSON().with_variant(JSONB(), "postgresql")
+
+
+class JobBase(DeclarativeBase):
+    # Kept apart from Base so the queue can live on SQLite as well as Postgres
+    pass
+
+
+class Task(JobBase):
+    __tablename__ = "mule_tasks"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    mule: Mapped[str] = mapped_column(String(255))  # "package.module:MuleClass"
+    args: Mapped[dict] = mapped_column(TaskJSON)
+    status: Mapped[str] = mapped_column(String(20), index=True, default="pending")
+    attempts: Mapped[int] = mapped_column(default=0)
+    max_attempts: Mapped[int] = mapped_column(default=3)
+    worker: Mapped[str | None] = mapped_column(String(255))
+    available_at: Mapped[float] = mapped_column(Float, index=True)
+    lease_expires_at: Mapped[float | None] = mapped_column(Float)
+    created_at: Mapped[float] = mapped_column(Float)
+    started_at: Mapped[float | None] = mapped_column(Float)
+    finished_at: Mapped[float | None] = mapped_column(Float)
+    result: Mapped[list | None] = mapped_column(TaskJSON)
+    error: Mapped[str | None] = mapped_column(Text)
+
+
+class TaskDependency(JobBase):
+    __tablename__ = "mule_task_dependencies"
+
+    task_id: Mapped[int] = mapped_column(ForeignKey("mule_tasks.id"), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    depends_on_id: Mapped[int] = mapped_column(ForeignKey("mule_tasks.id"), index=True)
@@ -3,21 +3,27 @@ import os
 import sys
 import asyncio
 import logging
-import aiohttp
 import argparse
+import functools
+import contextlib
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Awaitable, Generator
-from markdownify import markdownify as md
-from ddgs import DDGS
-from lxml import html, etree
+from typing import TYPE_CHECKING, AsyncGenerator, Awaitable, Callable, Generator
 
-logging.basicConfig(filename="/tmp/mule.log", level=logging.INFO, filemode="a+")
+from lmmule.ratelimit import LIMITER
+from lmmule.checkpoint import Checkpoint
+from lmmule.telemetry import TELEMETRY, ollama_usage, openrouter_usage
+
+# aiohttp, ddgs, lxml and markdownify are imported where first used, so that
+# `import lmmule` and CLI start up fast
+if TYPE_CHECKING:
+    import aiohttp
 
 args = None
 USE_REMOTE = False
-OLLAMA_URL = "http://localhost:11434"
-OPENROUTER_URL = "https://openrouter.ai/api/v1"
+CHECKPOINT: Checkpoint | None = None
+OLLAMA_URL = os.environ.get("LMMULE_OLLAMA_URL", "http://localhost:11434")
+OPENROUTER_URL = os.environ.get("LMMULE_OPENROUTER_URL", "https://openrouter.ai/api/v1")
 
 BLOCKED_SOURCES = ["youtube.com", "google.com", "facebook.com"]
 ALLOWED_TAG_DEFAULT = {
@@ -36,23 +42,76 @@ ALLOWED_TAG_DEFAULT = {
 
 class MuleLoggerAdapter(logging.LoggerAdapter):
     def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
         prefix = f"[{self.extra.get('mule_name', 'Mule')}] "
         return prefix + msg, kwargs
 
 
+async def resolved(value):
+    return value
+
+
+def checkpointed(call):
+    """Resolve upstream results first so the Mule can be looked up in, or
+    stored to, CHECKPOINT by its identity and inputs."""
+
+    @functools.wraps(call)
+    async def wrapper(self, **depends_on: Awaitable[list[dict]]) -> list[dict]:
+        if CHECKPOINT is None:
+            return await call(self, **depends_on)
+
+        upstream = dict(zip(depends_on, await asyncio.gather(*depends_on.values())))
+        key = CHECKPOINT.node_key(self, upstream)
+        cached = CHECKPOINT.get(key, self)
+        if cached is not None:
+            self.log.info(f"reusing checkpoint {key[:12]}")
+            self.chat_history = cached
+            return cached
+
+        result = await call(self, **{k: resolved(v) for k, v in upstream.items()})
+        # llm_call swallows provider errors and leaves the prompt unanswered
+        if result and result[-1].get("role") != "user":
+            CHECKPOINT.put(key, self, result)
+        return result
+
+    return wrapper
+
+
 class Multils:
+    session: "aiohttp.ClientSession | None" = None
+
     @classmethod
-    def init_args(cls):
-        global args, USE_REMOTE
+    def init_args(cls) -> argparse.Namespace:
+        global args, USE_REMOTE, CHECKPOINT
 
         parser = argparse.ArgumentParser()
         parser.add_argument(
             "--remote", action="store_true", help="Tries to use OpenRouter if provided"
         )
         parser.add_argument("--model", default="phi4-mini", help="LLM model name")
+        parser.add_argument(
+            "--checkpoint",
+            action="store_true",
+            help="Reuse stored results for unchanged Mules (see python -m lmmule.checkpoint)",
+        )
+        parser.add_argument(
+            "--log-file", default="/tmp/mule.log", help="JSONL log, rotated by size"
+        )
+        parser.add_argument(
+            "--log-sample",
+            type=float,
+            default=1.0,
+            help="Fraction of INFO call logs to keep",
+        )
 
         args = parser.parse_args()
+        import lmmule.log
+
+        lmmule.log.configure(args.log_file, sample_rate=args.log_sample)
         USE_REMOTE = args.remote
+        if args.checkpoint or os.environ.get("LMMULE_RUN_ID"):
+            CHECKPOINT = Checkpoint()
+        return args
 
     @classmethod
     def get_openrouter_key(cls) -> str:
@@ -62,13 +121,77 @@ class Multils:
             sys.exit()
         return openrouter_key
 
+    @classmethod
+    async def open_session(cls, **kwargs) -> "aiohttp.ClientSession":
+        """Share one pooled session across requests until close_session()."""
+        import aiohttp
+
+        if Multils.session is None or Multils.session.closed:
+            Multils.session = aiohttp.ClientSession(**kwargs)
+        return Multils.session
+
+    @classmethod
+    async def close_session(cls):
+        if Multils.session is not None:
+            await Multils.session.close()
+            Multils.session = None
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def _response(cls, method: str, url: str, *, payload, headers, limit):
+        """Yields the first response that succeeded or is not worth retrying.
+        `limit` is a (provider, model) pair to rate limit and retry against."""
+        import aiohttp
+
+        async with contextlib.AsyncExitStack() as stack:
+            session = Multils.session
+            if session is None or session.closed:
+                session = await stack.enter_async_context(aiohttp.ClientSession())
+
+            attempt = 0
+            yielded = False
+            while True:
+                if limit:
+                    TELEMETRY.current().add(
+                        "queue_wait_s", await LIMITER.acquire(*limit)
+                    )
+                try:
+                    async with session.request(
+                        method.upper(), url, json=payload, headers=headers
+                    ) as response:
+                        delay = (
+                            LIMITER.update(
+                                *limit, response.status, response.headers, attempt
+                            )
+                            if limit
+                            else None
+                        )
+                        if response.status == 200 or delay is None:
+                            yielded = True
+                            yield response
+                            return
+                except aiohttp.ClientConnectionError:
+                    if yielded or not limit:
+                        raise
+                    if attempt >= LIMITER.max_retries:
+                        LIMITER.stats_for(*limit).failed += 1
+                        raise
+                    delay = LIMITER.backoff(attempt)
+                    LIMITER.stats_for(*limit).retried += 1
+
+                attempt += 1
+                TELEMETRY.current().add("retries", 1)
+                await asyncio.sleep(delay)
+
     @classmethod
     async def request(
-        cls, method: str, url: str, *, payload=None, headers=None
+        cls, method: str, url: str, *, payload=None, headers=None, limit=None
     ) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method.upper(), url, json=payload, headers=headers
+        import aiohttp
+
+        try:
+            async with cls._response(
+                method, url, payload=payload, headers=headers, limit=limit
             ) as response:
                 if response.status == 200:
                     try:
@@ -80,13 +203,55 @@ class Multils:
                             return {"text": ""}
 
                 return {"error": await response.text()}
+        except aiohttp.ClientConnectionError as e:
+            if not limit:
+                raise
+            return {"error": str(e)}
+
+    @classmethod
+    async def stream(
+        cls, method: str, url: str, *, payload=None, headers=None, limit=None
+    ) -> AsyncGenerator[dict, None]:
+        """Yields the JSON chunks of an NDJSON (Ollama) or SSE (OpenRouter) body."""
+        import aiohttp
+
+        try:
+            async with cls._response(
+                method, url, payload=payload, headers=headers, limit=limit
+            ) as response:
+                if response.status != 200:
+                    yield {"error": await response.text()}
+                    return
+
+                async for line in response.content:
+                    line = line.strip()
+                    if line.startswith(b"data:"):
+                        line = line[5:].strip()
+                    if not line or line.startswith(b":"):
+                        continue
+                    if line == b"[DONE]":
+                        # read through to EOF so the connection can be reused
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except aiohttp.ClientConnectionError as e:
+            if not limit:
+                raise
+            yield {"error": str(e)}
 
     @classmethod
     def ddg_search(cls, query: str, num_results: int) -> list:
+        from ddgs import DDGS
+
         return DDGS().text(query, max_results=num_results, region="wt-wt")
 
     @classmethod
     async def scrape_page(cls, title: str, url: str, allowed_tags: set[str]) -> dict:
+        from lxml import html, etree
+        from markdownify import markdownify as md
+
         if any(domain in url for domain in BLOCKED_SOURCES):
             return {}
 
@@ -175,30 +340,31 @@ class Multils:
 
             return tree
 
-        page = (await cls.request("GET", url)).get("text", "")
-        if not page or not page.strip():
-            return {}
-
-        tree = html.fromstring(page)
-        tree = tree.find("body") if tree.find("body") is not None else tree
-
-        primary_content_div = find_content_heavy_div(tree)
-
-        all_tags = set([elem.tag for elem in tree.iter()])
-        tags_to_remove = list(all_tags - allowed_tags)
-        etree.strip_elements(primary_content_div, *tags_to_remove, with_tail=False)
-
-        return {
-            "title": title,
-            "url": url,
-            "content": md(
-                (
-                    etree.tostring(
-                        primary_content_div, encoding="unicode", pretty_print=True
-                    )
+        with TELEMETRY.span("scrape", url=url):
+            page = (await cls.request("GET", url)).get("text", "")
+            if not page or not page.strip():
+                return {}
+
+            tree = html.fromstring(page)
+            tree = tree.find("body") if tree.find("body") is not None else tree
+
+            primary_content_div = find_content_heavy_div(tree)
+
+            all_tags = set([elem.tag for elem in tree.iter()])
+            tags_to_remove = list(all_tags - allowed_tags)
+            etree.strip_elements(primary_content_div, *tags_to_remove, with_tail=False)
+
+            return {
+                "title": title,
+                "url": url,
+                "content": md(
+                    (
+                        etree.tostring(
+                            primary_content_div, encoding="unicode", pretty_print=True
+                        )
+                    ),
                 ),
-            ),
-        }
+            }
 
     @classmethod
     async def websearch(
@@ -232,12 +398,18 @@ class Mule(ABC, Multils):
     output_format: dict = field(default_factory=dict)
     search_allowed_tags: set[str] = field(default_factory=lambda: ALLOWED_TAG_DEFAULT)
     chat_history: list[dict] = field(default_factory=list)
+    on_token: Callable[[str], None] | None = field(default=None, repr=False)
 
     def __post_init__(self):
         self.log = MuleLoggerAdapter(
             logging.getLogger(__name__), {"mule_name": self.mule_name}
         )
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "__call__" in cls.__dict__:
+            cls.__call__ = checkpointed(cls.__dict__["__call__"])
+
     @abstractmethod
     async def __call__(self, **depends_on: Awaitable[list[dict]]) -> list[dict]:
         pass
@@ -246,28 +418,86 @@ class Mule(ABC, Multils):
         resp = None
         payload = {
             "model": self.model_name,
-            "stream": False,
+            "stream": self.on_token is not None,
             "format": self.output_format,
             "messages": self.chat_history,
         }
 
-        try:
-            resp = await Mule.request("POST", f"{OLLAMA_URL}/api/chat", payload=payload)
-            self.chat_history += [
-                {"role": "system", "content": resp["message"]["content"]}
-            ]
-            self.log.info(
-                f"""Ollama call:
-                \ninput: {json.dumps(self.chat_history[-2], indent=2)}
-                \noutput: {json.dumps(self.chat_history[-1], indent=2)}"""
-            )
-        except Exception as e:
-            self.log.error(
-                f"""Could not call Ollama | {e}\n{resp}
-                \npayload:{json.dumps(payload, indent=2)}"""
-            )
+        with TELEMETRY.span(
+            "llm.chat",
+            provider="ollama",
+            mule=type(self).__name__,
+            mule_name=self.mule_name,
+            model=self.model_name,
+        ) as span:
+            try:
+                resp = (
+                    await self._ollama_stream(payload)
+                    if self.on_token
+                    else await Mule.request(
+                        "POST", f"{OLLAMA_URL}/api/chat", payload=payload
+                    )
+                )
+                self.chat_history += [
+                    {"role": "system", "content": resp["message"]["content"]}
+                ]
+                span.set(**ollama_usage(resp, span))
+                self.log.info(
+                    "Ollama call",
+                    extra={
+                        "model": self.model_name,
+                        "input": self.chat_history[-2],
+                        "output": self.chat_history[-1],
+                    },
+                )
+            except Exception as e:
+                span.fail(e)
+                # the history can be huge; the last prompt is enough to debug
+                self.log.error(
+                    "Could not call Ollama | %r",
+                    e,
+                    extra={
+                        "model": self.model_name,
+                        "response": resp,
+                        "messages": len(payload["messages"]),
+                        "input": payload["messages"][-1:],
+                    },
+                )
         return self.chat_history
 
+    async def _ollama_stream(self, payload: dict) -> dict:
+        """Streams tokens to on_token and returns the equivalent full response."""
+        parts, last = [], {}
+        async for chunk in Mule.stream(
+            "POST", f"{OLLAMA_URL}/api/chat", payload=payload
+        ):
+            if "error" in chunk:
+                return chunk
+            if token := chunk.get("message", {}).get("content"):
+                if not parts:
+                    span = TELEMETRY.current()
+                    span.set(ttft_s=span.elapsed())
+                parts.append(token)
+                self.on_token(token)
+            last = chunk
+        return {**last, "message": {"role": "assistant", "content": "".join(parts)}}
+
+    async def _openrouter_stream(self, method: str, url: str, **kwargs) -> dict:
+        """Streams tokens to on_token and returns the equivalent full response."""
+        parts, usage = [], None
+        async for chunk in Mule.stream(method, url, **kwargs):
+            if "error" in chunk:
+                return chunk
+            usage = chunk.get("usage") or usage
+            choices = chunk.get("choices") or [{}]
+            if token := (choices[0].get("delta") or {}).get("content"):
+                if not parts:
+                    span = TELEMETRY.current()
+                    span.set(ttft_s=span.elapsed())
+                parts.append(token)
+                self.on_token(token)
+        return {"choices": [{"message": {"content": "".join(parts)}}], "usage": usage}
+
     async def _openrouter_call(self) -> list[dict]:
         resp = None
         headers = {
@@ -278,27 +508,54 @@ class Mule(ABC, Multils):
             "model": self.model_name,
             "messages": self.chat_history,
         }
-
-        try:
-            resp = await Mule.request(
-                "POST",
-                f"{OPENROUTER_URL}/chat/completions",
-                payload=payload,
-                headers=headers,
-            )
-            self.chat_history += [
-                {"role": "system", "content": resp["choices"][0]["message"]["content"]}
-            ]
-            self.log.info(
-                f"""Openrouter call:
-                \ninput: {json.dumps(self.chat_history[-2], indent=2)}
-                \noutput: {json.dumps(self.chat_history[-1], indent=2)}"""
-            )
-        except Exception as e:
-            self.log.error(
-                f"""Could not call Openrouter | {e}\n{resp}
-                \npayload:{json.dumps(payload, indent=2)}"""
-            )
+        if self.on_token:
+            payload["stream"] = True
+
+        with TELEMETRY.span(
+            "llm.chat",
+            provider="openrouter",
+            mule=type(self).__name__,
+            mule_name=self.mule_name,
+            model=self.model_name,
+        ) as span:
+            try:
+                resp = await (
+                    self._openrouter_stream if self.on_token else Mule.request
+                )(
+                    "POST",
+                    f"{OPENROUTER_URL}/chat/completions",
+                    payload=payload,
+                    headers=headers,
+                    limit=("openrouter", self.model_name),
+                )
+                self.chat_history += [
+                    {
+                        "role": "system",
+                        "content": resp["choices"][0]["message"]["content"],
+                    }
+                ]
+                span.set(**openrouter_usage(resp, span))
+                self.log.info(
+                    "Openrouter call",
+                    extra={
+                        "model": self.model_name,
+                        "input": self.chat_history[-2],
+                        "output": self.chat_history[-1],
+                    },
+                )
+            except Exception as e:
+                span.fail(e)
+                # the history can be huge; the last prompt is enough to debug
+                self.log.error(
+                    "Could not call Openrouter | %r",
+                    e,
+                    extra={
+                        "model": self.model_name,
+                        "response": resp,
+                        "messages": len(payload["messages"]),
+                        "input": payload["messages"][-1:],
+                    },
+                )
         return self.chat_history
 
     async def llm_call(self, prompt: str) -> list[dict]:
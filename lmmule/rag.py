@@ -3,61 +3,25 @@ from sqlalchemy import text, select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from pgvector.sqlalchemy import Vector
-from abc import ABC, abstractmethod
 from dataclasses import dataclass
 import sys
 
-from lmmule.mule import Mule, OPENROUTER_URL, OLLAMA_URL
+from lmmule.telemetry import TELEMETRY
 from lmmule.models import Base, Source, Document
-
-
-@dataclass
-class EmbeddingProvider(ABC):
-    model_name: str
-    embed_dim: int
-
-    @abstractmethod
-    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
-        pass
-
-
-@dataclass
-class OllamaEmbedding(EmbeddingProvider):
-    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
-        resp = await Mule.request(
-            "POST",
-            f"{OLLAMA_URL}/api/embed",
-            payload={"model": self.model_name, "input": texts},
-        )
-        return resp["embeddings"] if resp.get("embeddings") else [[]]
-
-
-@dataclass
-class OpenRouterEmbedding(EmbeddingProvider):
-    async def batch_embed(self, texts: list[str]) -> list[list[float]]:
-        openrouter_key = Mule.get_openrouter_key()
-        resp = await Mule.request(
-            "POST",
-            f"{OPENROUTER_URL}/embeddings",
-            payload={"model": self.model_name, "input": texts},
-            headers={
-                "Authorization": f"Bearer {openrouter_key}",
-                "Content-Type": "application/json",
-            },
-        )
-        return resp["embeddings"] if resp.get("embeddings") else [[]]
+from lmmule.embeddings import EmbeddingProvider, OllamaEmbedding, OpenRouterEmbedding
 
 
 @dataclass
 class Rag:
     postgres_url: str
     embedder: EmbeddingProvider
+    echo: bool = True
 
     def __post_init__(self):
         Document.embedding = mapped_column(Vector(self.embedder.embed_dim))
 
     async def init_db(self):
-        self.engine = create_async_engine(self.postgres_url, echo=True)
+        self.engine = create_async_engine(self.postgres_url, echo=self.echo)
         self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
@@ -66,6 +30,9 @@ class Rag:
             sys.exit()
         return self
 
+    async def close(self):
+        await self.engine.dispose()
+
     async def verify_db_connection(self) -> bool:
         try:
             async with self.Session() as session:
@@ -78,18 +45,19 @@ class Rag:
     async def upsert_source(
         self, name: str, author: str | None = None, type: str = "unknown"
     ) -> int:
-        async with self.Session() as db:
-            stmt = (
-                insert(Source)
-                .values(name=name, author=author, type=type)
-                .on_conflict_do_update(
-                    index_elements=["name"], set_=dict(author=author, type=type)
+        with TELEMETRY.span("rag.upsert_source"):
+            async with self.Session() as db:
+                stmt = (
+                    insert(Source)
+                    .values(name=name, author=author, type=type)
+                    .on_conflict_do_update(
+                        index_elements=["name"], set_=dict(author=author, type=type)
+                    )
+                    .returning(Source.id)
                 )
-                .returning(Source.id)
-            )
-            result = await db.execute(stmt)
-            await db.commit()
-            return result.scalar_one()
+                result = await db.execute(stmt)
+                await db.commit()
+                return result.scalar_one()
 
     async def upsert_documents(
         self,
@@ -98,23 +66,26 @@ class Rag:
         namespace: str = "default",
         metadatas: list[dict] | None = None,
     ):
-        metadatas = metadatas or [{}] * len(texts)
-        embeddings = await self.embedder.batch_embed(texts)
-        async with self.Session() as db:
-            for text, embedding, metadata in zip(texts, embeddings, metadatas):
-                stmt = (
-                    insert(Document)
-                    .values(
-                        text=text,
-                        namespace=namespace,
-                        embedding=embedding,
-                        source_id=source_id,
-                        metadata_=metadata,
+        with TELEMETRY.span(
+            "rag.upsert_documents", namespace=namespace, texts=len(texts)
+        ):
+            metadatas = metadatas or [{}] * len(texts)
+            embeddings = await self.embedder.batch_embed(texts)
+            async with self.Session() as db:
+                for text, embedding, metadata in zip(texts, embeddings, metadatas):
+                    stmt = (
+                        insert(Document)
+                        .values(
+                            text=text,
+                            namespace=namespace,
+                            embedding=embedding,
+                            source_id=source_id,
+                            metadata_=metadata,
+                        )
+                        .on_conflict_do_nothing(constraint="uq_text_hash_namespace")
                     )
-                    .on_conflict_do_nothing(constraint="uq_text_hash_namespace")
-                )
-                await db.execute(stmt)
-            await db.commit()
+                    await db.execute(stmt)
+                await db.commit()
 
     async def search(
         self,
@@ -123,52 +94,54 @@ class Rag:
         top_k: int = 5,
         threshold: float = 0.7,
     ) -> list[dict]:
-        query_embedding = (await self.embedder.batch_embed([query]))[0]
-        async with self.Session() as db:
-            stmt = (
-                select(
-                    Document.text,
-                    Document.metadata_,
-                    Source.name,
-                    Source.author,
-                    Source.type,
-                    Document.embedding.cosine_distance(query_embedding).label(
-                        "distance"
-                    ),
-                )
-                .join(Document.source)
-                .where(
-                    Document.namespace == namespace,
-                    Document.embedding.cosine_distance(query_embedding) < threshold,
+        with TELEMETRY.span("rag.search", namespace=namespace):
+            query_embedding = (await self.embedder.batch_embed([query]))[0]
+            async with self.Session() as db:
+                stmt = (
+                    select(
+                        Document.text,
+                        Document.metadata_,
+                        Source.name,
+                        Source.author,
+                        Source.type,
+                        Document.embedding.cosine_distance(query_embedding).label(
+                            "distance"
+                        ),
+                    )
+                    .join(Document.source)
+                    .where(
+                        Document.namespace == namespace,
+                        Document.embedding.cosine_distance(query_embedding) < threshold,
+                    )
+                    .order_by("distance")
+                    .limit(top_k)
                 )
-                .order_by("distance")
-                .limit(top_k)
-            )
-            result = await db.execute(stmt)
-            return [
-                {
-                    "text": text,
-                    "metadata": metadata,
-                    "source": {
-                        "name": src_name,
-                        "author": src_author,
-                        "type": src_type,
-                    },
-                    "score": 1 - distance,
-                }
-                for text, metadata, src_name, src_author, src_type, distance in result
-            ]
+                result = await db.execute(stmt)
+                return [
+                    {
+                        "text": text,
+                        "metadata": metadata,
+                        "source": {
+                            "name": src_name,
+                            "author": src_author,
+                            "type": src_type,
+                        },
+                        "score": 1 - distance,
+                    }
+                    for text, metadata, src_name, src_author, src_type, distance in result
+                ]
 
     async def get_all(self, namespace: str) -> list[dict]:
-        async with self.Session() as db:
-            stmt = select(Document).where(Document.namespace == namespace)
-            result = await db.execute(stmt)
-            return [
-                {
-                    "id": doc.id,
-                    "text": doc.text,
-                    "metadata": doc.metadata_,
-                    "source_id": doc.source_id,
-                }
-                for doc in result.scalars()
-            ]
+        with TELEMETRY.span("rag.get_all", namespace=namespace):
+            async with self.Session() as db:
+                stmt = select(Document).where(Document.namespace == namespace)
+                result = await db.execute(stmt)
+                return [
+                    {
+                        "id": doc.id,
+                        "text": doc.text,
+                        "metadata": doc.metadata_,
+                        "source_id": doc.source_id,
+                    }
+                    for doc in result.scalars()
+                ]
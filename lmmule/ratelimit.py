@@ -0,0 +1,196 @@
+import time
+import random
+import asyncio
+from dataclasses import dataclass, field
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class TokenBucket:
+    rate: float  # tokens refilled per second
+    capacity: float
+    tokens: float = -1
+    updated: float = field(default_factory=time.monotonic)
+    blocked_until: float = 0
+
+    def __post_init__(self):
+        if self.tokens < 0:
+            self.tokens = self.capacity
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns time waited."""
+        waited = 0.0
+        async with self.lock:
+            while (wait := self.wait_time()) > 0:
+                await asyncio.sleep(wait)
+                waited += wait
+            self.tokens -= 1
+        return waited
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def sync_remaining(self, remaining: float):
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+
+@dataclass
+class RateLimitStats:
+    requests: int = 0
+    delayed: int = 0
+    throttled: int = 0
+    retried: int = 0
+    failed: int = 0
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class RateLimiter:
+    """Per provider and per model token buckets, fed back by response headers."""
+
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 60.0
+    # provider -> (requests per second, burst). Unset by default: paid
+    # OpenRouter limits depend on the account, and 429s are still backed off
+    provider_limits: dict = field(default_factory=dict)
+    # (provider, model) -> (requests per second, burst)
+    model_limits: dict = field(default_factory=dict)
+    # applied to models ending in ":free" when not set in model_limits
+    free_model_limit: tuple = (20 / 60, 5)
+
+    def __post_init__(self):
+        self.buckets: dict = {}
+        self.stats: dict[tuple, RateLimitStats] = {}
+
+    def configure(
+        self, provider: str, model: str | None = None, *, rate: float, burst: float
+    ):
+        key = (provider, model)
+        if model is None:
+            self.provider_limits[provider] = (rate, burst)
+        else:
+            self.model_limits[key] = (rate, burst)
+        self.buckets.pop(key, None)
+
+    def _bucket(self, provider: str, model: str | None) -> TokenBucket | None:
+        key = (provider, model)
+        if key not in self.buckets:
+            if model is None:
+                limit = self.provider_limits.get(provider)
+            elif key in self.model_limits:
+                limit = self.model_limits[key]
+            elif model.endswith(":free"):
+                limit = self.free_model_limit
+            else:
+                limit = None
+            self.buckets[key] = TokenBucket(*limit) if limit else None
+        return self.buckets[key]
+
+    def stats_for(self, provider: str, model: str) -> RateLimitStats:
+        return self.stats.setdefault((provider, model), RateLimitStats())
+
+    async def acquire(self, provider: str, model: str) -> float:
+        stats = self.stats_for(provider, model)
+        stats.requests += 1
+        waited = 0.0
+        for bucket in (self._bucket(provider, None), self._bucket(provider, model)):
+            if bucket is not None:
+                waited += await bucket.acquire()
+        if waited > 0:
+            stats.delayed += 1
+            stats.wait_seconds += waited
+        return waited
+
+    def update(
+        self, provider: str, model: str, status: int, headers, attempt: int
+    ) -> float | None:
+        """Apply response headers to the buckets. Returns seconds to wait before
+        retrying, or None if the response should not be retried."""
+        delay = self.retry_after(headers)
+        reset = self.reset_after(headers)
+        remaining = headers.get("X-RateLimit-Remaining")
+
+        for bucket in (self._bucket(provider, None), self._bucket(provider, model)):
+            if bucket is None:
+                continue
+            if remaining is not None:
+                try:
+                    bucket.sync_remaining(float(remaining))
+                except ValueError:
+                    pass
+            if status == 429:
+                bucket.block_for(delay or reset or self.backoff(attempt))
+
+        if status not in RETRY_STATUSES:
+            return None
+
+        stats = self.stats_for(provider, model)
+        if attempt >= self.max_retries:
+            stats.failed += 1
+            return None
+
+        stats.retried += 1
+        if status == 429:
+            stats.throttled += 1
+        return delay or reset or self.backoff(attempt)
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    @classmethod
+    def retry_after(cls, headers) -> float | None:
+        value = headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        from email.utils import parsedate_to_datetime
+
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def reset_after(cls, headers) -> float | None:
+        # OpenRouter sends the reset time as epoch milliseconds
+        value = headers.get("X-RateLimit-Reset")
+        if value is None:
+            return None
+        try:
+            reset = float(value)
+        except ValueError:
+            return None
+        if reset > 1e12:
+            reset /= 1000
+        if reset > 1e9:
+            reset -= time.time()
+        return max(reset, 0)
+
+    def summary(self) -> dict:
+        return {
+            f"{provider}/{model}": vars(s).copy()
+            for (provider, model), s in self.stats.items()
+        }
+
+
+LIMITER = RateLimiter()
@@ -0,0 +1,504 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import argparse
+import importlib
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+import lmmule.log
+import lmmule.mule
+from lmmule.mule import Mule, MuleLoggerAdapter
+from lmmule.ratelimit import LIMITER
+from lmmule.telemetry import TELEMETRY, prometheus_samples
+
+FLOW_TTL = 3600
+
+
+def request_key(*parts) -> str:
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class NodeFailed(Exception):
+    pass
+
+
+@dataclass
+class Flow:
+    id: str
+    key: str
+    nodes: dict
+    status: str = "running"
+    results: dict = field(default_factory=dict)
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def __post_init__(self):
+        self.events: list[tuple[str, dict]] = []
+        self.updated = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def emit(self, event: str, **data):
+        self.events.append((event, data))
+        # wake current subscribers; later waits use a fresh event
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "results": self.results,
+        }
+
+
+@dataclass
+class MuleServer:
+    """Long running service holding one warm process, one pooled HTTP session
+    and, if configured, one Rag connection pool."""
+
+    rag: object = None  # lmmule.rag.Rag
+    mule_modules: list[str] = field(
+        default_factory=lambda: ["lmmule.examples.allmules"]
+    )
+
+    def __post_init__(self):
+        self.log = MuleLoggerAdapter(
+            logging.getLogger(__name__), {"mule_name": "server"}
+        )
+        self.flows: dict[str, Flow] = {}
+        self.inflight_flows: dict[str, Flow] = {}
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.started_at = time.time()
+        self.counters = {"requests": 0, "coalesced": 0, "flows": 0, "flow_errors": 0}
+        self.mule_classes = {}
+        for module in self.mule_modules:
+            for name, obj in vars(importlib.import_module(module)).items():
+                if isinstance(obj, type) and issubclass(obj, Mule) and obj is not Mule:
+                    self.mule_classes[name] = obj
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.count_requests])
+        app.add_routes(
+            [
+                web.post("/flows", self.submit_flow),
+                web.get("/flows/{id}", self.get_flow),
+                web.delete("/flows/{id}", self.cancel_flow),
+                web.get("/flows/{id}/events", self.flow_events),
+                web.post("/rag/search", self.rag_search),
+                web.post("/rag/documents", self.rag_upsert),
+                web.get("/rag/documents", self.rag_get_all),
+                web.get("/health", self.health),
+                web.get("/metrics", self.metrics),
+                web.get("/traces", self.traces),
+            ]
+        )
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+    async def on_startup(self, app):
+        await Mule.open_session()
+        if self.rag is not None:
+            await self.rag.init_db()
+
+    async def on_cleanup(self, app):
+        for flow in self.inflight_flows.values():
+            flow.task.cancel()
+        await Mule.close_session()
+        if self.rag is not None:
+            await self.rag.close()
+
+    @web.middleware
+    async def count_requests(self, request, handler):
+        self.counters["requests"] += 1
+        return await handler(request)
+
+    async def coalesce(self, key: str, factory):
+        """Share the result of an identical request that is still in flight."""
+        if key in self.inflight:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.ensure_future(factory())
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self.inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self.inflight.pop(key, None))
+
+    async def body(self, request) -> dict:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="request body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="request body must be a JSON object")
+        return body
+
+    # Flows
+
+    def build_flow(self, nodes: dict) -> list[str]:
+        """Validates the node specs and returns them in dependency order."""
+        if not isinstance(nodes, dict) or not nodes:
+            raise web.HTTPBadRequest(text="'nodes' must be a non-empty object")
+
+        order, visiting = [], set()
+
+        def visit(name: str):
+            if name in order:
+                return
+            if name in visiting:
+                raise web.HTTPBadRequest(text=f"dependency cycle at '{name}'")
+            if name not in nodes:
+                raise web.HTTPBadRequest(text=f"unknown node '{name}'")
+            spec = nodes[name]
+            if not isinstance(spec, dict):
+                raise web.HTTPBadRequest(text=f"'{name}': node spec must be an object")
+            if spec.get("mule") not in self.mule_classes:
+                raise web.HTTPBadRequest(
+                    text=f"'{name}': mule must be one of {sorted(self.mule_classes)}"
+                )
+            if not isinstance(spec.get("model_name"), str):
+                raise web.HTTPBadRequest(text=f"'{name}': model_name is required")
+            for key in ("base_prompt", "topics"):
+                if not isinstance(spec.get(key, ""), str):
+                    raise web.HTTPBadRequest(text=f"'{name}': {key} must be a string")
+            # Ollama takes a JSON schema or "json"
+            if not isinstance(spec.get("output_format", {}), (dict, str)):
+                raise web.HTTPBadRequest(
+                    text=f"'{name}': output_format must be an object or string"
+                )
+            depends_on = spec.get("depends_on", {})
+            if not isinstance(depends_on, dict) or not all(
+                isinstance(dep, str) for dep in depends_on.values()
+            ):
+                raise web.HTTPBadRequest(
+                    text=f"'{name}': depends_on must map argument names to node names"
+                )
+            visiting.add(name)
+            for dep in spec.get("depends_on", {}).values():
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in nodes:
+            visit(name)
+        return order
+
+    async def run_flow(self, flow: Flow, order: list[str]):
+        calls: dict[str, asyncio.Task] = {}
+        for name in order:
+            spec = flow.nodes[name]
+            mule = self.mule_classes[spec["mule"]](
+                name,
+                model_name=spec["model_name"],
+                base_prompt=spec.get("base_prompt", ""),
+                topics=spec.get("topics", ""),
+                output_format=spec.get("output_format", {}),
+                on_token=lambda token, name=name: flow.emit(
+                    "token", node=name, token=token
+                ),
+            )
+            calls[name] = asyncio.create_task(
+                self.run_node(
+                    flow,
+                    name,
+                    mule,
+                    {
+                        arg: calls[dep]
+                        for arg, dep in spec.get("depends_on", {}).items()
+                    },
+                )
+            )
+
+        try:
+            await asyncio.gather(*calls.values())
+            flow.status = "done"
+        except asyncio.CancelledError:
+            flow.status = "cancelled"
+        except Exception as e:
+            self.counters["flow_errors"] += 1
+            self.log.error(f"flow {flow.id} failed | {e!r}")
+            flow.status = "failed"
+            flow.error = repr(e)
+        finally:
+            for call in calls.values():
+                call.cancel()
+            flow.finished_at = time.time()
+            self.inflight_flows.pop(flow.key, None)
+            flow.emit(flow.status, **flow.summary())
+
+    async def run_node(self, flow: Flow, name: str, mule: Mule, depends_on: dict):
+        result = await mule(**depends_on)
+        # llm_call swallows provider errors and leaves the prompt unanswered
+        if not result or result[-1].get("role") == "user":
+            raise NodeFailed(f"node '{name}': model returned no response")
+        flow.results[name] = result
+        flow.emit("node_done", node=name, content=result[-1]["content"])
+        return result
+
+    def prune_flows(self):
+        now = time.time()
+        for flow_id, flow in list(self.flows.items()):
+            if flow.finished_at and now - flow.finished_at > FLOW_TTL:
+                del self.flows[flow_id]
+
+    def get(self, request) -> Flow:
+        flow = self.flows.get(request.match_info["id"])
+        if flow is None:
+            raise web.HTTPNotFound(text="no such flow")
+        return flow
+
+    async def submit_flow(self, request):
+        """POST {"nodes": {name: {"mule", "model_name", "base_prompt",
+        "output_format", "depends_on": {arg: node}}}}. Add ?wait=1 to block
+        until the flow finishes."""
+        body = await self.body(request)
+        nodes = body.get("nodes")
+        order = self.build_flow(nodes)
+        key = request_key(nodes, lmmule.mule.USE_REMOTE)
+
+        flow = self.inflight_flows.get(key)
+        if flow is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.prune_flows()
+            self.counters["flows"] += 1
+            flow = Flow(uuid.uuid4().hex, key, nodes)
+            self.flows[flow.id] = flow
+            self.inflight_flows[key] = flow
+            flow.task = asyncio.create_task(self.run_flow(flow, order))
+
+        if request.query.get("wait"):
+            await asyncio.shield(flow.task)
+        return web.json_response(
+            flow.summary(), status=200 if flow.finished_at else 202
+        )
+
+    async def get_flow(self, request):
+        return web.json_response(self.get(request).summary())
+
+    async def cancel_flow(self, request):
+        flow = self.get(request)
+        if flow.finished_at is None:
+            flow.task.cancel()
+        return web.json_response({"id": flow.id, "status": "cancelling"})
+
+    async def flow_events(self, request):
+        """Server-sent events: token, node_done and finally done/failed/cancelled.
+        Late subscribers get every event from the start of the flow."""
+        flow = self.get(request)
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
+        )
+        await response.prepare(request)
+
+        sent = 0
+        try:
+            while True:
+                updated = flow.updated
+                while sent < len(flow.events):
+                    event, data = flow.events[sent]
+                    sent += 1
+                    await response.write(
+                        f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+                    )
+                    if event in ("done", "failed", "cancelled"):
+                        return response
+                await updated.wait()
+        except ConnectionResetError:
+            # the client went away; the flow keeps running
+            return response
+
+    # Rag
+
+    def require_rag(self):
+        if self.rag is None:
+            raise web.HTTPServiceUnavailable(
+                text="server started without --postgres-url"
+            )
+        return self.rag
+
+    async def rag_search(self, request):
+        """POST {"query", "namespace", "top_k", "threshold"}"""
+        rag = self.require_rag()
+        body = await self.body(request)
+        if not isinstance(body.get("query"), str) or not body["query"]:
+            raise web.HTTPBadRequest(text="'query' must be a non-empty string")
+        if not isinstance(body.get("namespace", ""), str):
+            raise web.HTTPBadRequest(text="'namespace' must be a string")
+        top_k = body.get("top_k", 5)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+            raise web.HTTPBadRequest(text="'top_k' must be a positive integer")
+        threshold = body.get("threshold", 0.7)
+        if not isinstance(threshold, (int, float)) or isinstance(threshold, bool):
+            raise web.HTTPBadRequest(text="'threshold' must be a number")
+        kwargs = {k: body[k] for k in ("namespace", "top_k", "threshold") if k in body}
+        results = await self.coalesce(
+            request_key("search", body["query"], kwargs),
+            lambda: rag.search(body["query"], **kwargs),
+        )
+        return web.json_response(results)
+
+    async def rag_upsert(self, request):
+        """POST {"source": {"name", "author", "type"}, "texts", "namespace", "metadatas"}"""
+        rag = self.require_rag()
+        body = await self.body(request)
+        source, texts = body.get("source") or {}, body.get("texts")
+        if (
+            not isinstance(source, dict)
+            or not isinstance(source.get("name"), str)
+            or not isinstance(texts, list)
+            or not all(isinstance(text, str) for text in texts)
+        ):
+            raise web.HTTPBadRequest(
+                text="'source.name' and 'texts' (a list of strings) are required"
+            )
+
+        async def upsert():
+            source_id = await rag.upsert_source(
+                source["name"], source.get("author"), source.get("type", "unknown")
+            )
+            await rag.upsert_documents(
+                texts,
+                source_id,
+                namespace=body.get("namespace", "default"),
+                metadatas=body.get("metadatas"),
+            )
+            return {"source_id": source_id, "count": len(texts)}
+
+        return web.json_response(
+            await self.coalesce(request_key("upsert", body), upsert)
+        )
+
+    async def rag_get_all(self, request):
+        rag = self.require_rag()
+        namespace = request.query.get("namespace", "default")
+        return web.json_response(
+            await self.coalesce(
+                request_key("get_all", namespace), lambda: rag.get_all(namespace)
+            )
+        )
+
+    # Ops
+
+    async def health(self, request):
+        db = await self.rag.verify_db_connection() if self.rag is not None else None
+        return web.json_response(
+            {"status": "ok" if db is not False else "degraded", "db": db},
+            status=200 if db is not False else 503,
+        )
+
+    async def metrics(self, request):
+        """Prometheus text, or ?format=json for a quick look."""
+        gauges = {
+            "uptime_seconds": time.time() - self.started_at,
+            "flows_in_flight": len(self.inflight_flows),
+            "requests_in_flight": len(self.inflight),
+        }
+        if request.query.get("format") == "json":
+            return web.json_response(
+                {**self.counters, **gauges, "rate_limits": LIMITER.summary()}
+            )
+
+        lines = []
+        for name, value in self.counters.items():
+            lines += prometheus_samples(
+                f"lmmule_server_{name}_total",
+                "counter",
+                f"Server {name.replace('_', ' ')}",
+                [({}, value)],
+            )
+        for name, value in gauges.items():
+            lines += prometheus_samples(
+                f"lmmule_server_{name}",
+                "gauge",
+                f"Server {name.replace('_', ' ')}",
+                [({}, value)],
+            )
+        limits = LIMITER.summary()
+        for stat in ("requests", "delayed", "throttled", "retried", "failed"):
+            lines += prometheus_samples(
+                f"lmmule_ratelimit_{stat}_total",
+                "counter",
+                f"Rate limited requests {stat}",
+                [
+                    (dict(zip(("provider", "model"), key.split("/", 1))), s[stat])
+                    for key, s in limits.items()
+                ],
+            )
+        return web.Response(
+            text="\n".join(lines) + "\n" + TELEMETRY.prometheus(),
+            content_type="text/plain",
+            headers={"X-Prometheus-Version": "0.0.4"},
+        )
+
+    async def traces(self, request):
+        """OTLP/JSON spans; ?clear=1 drains the buffer."""
+        return web.json_response(
+            TELEMETRY.export_spans(clear=bool(request.query.get("clear")))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Mule flows and Rag over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--remote", action="store_true", help="Tries to use OpenRouter if provided"
+    )
+    parser.add_argument(
+        "--mules",
+        nargs="+",
+        default=["lmmule.examples.allmules"],
+        help="Modules whose Mule classes flows may use",
+    )
+    parser.add_argument("--postgres-url", default=os.environ.get("LMMULE_POSTGRES_URL"))
+    parser.add_argument(
+        "--embedder", choices=["ollama", "openrouter"], default="ollama"
+    )
+    parser.add_argument("--embed-model", default="embeddinggemma")
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument(
+        "--no-telemetry", action="store_true", help="Skip per-call spans and metrics"
+    )
+    parser.add_argument("--log-file", default="/tmp/mule.log")
+    args = parser.parse_args()
+    lmmule.log.configure(args.log_file)
+    lmmule.mule.USE_REMOTE = args.remote
+    TELEMETRY.enabled = not args.no_telemetry
+
+    rag = None
+    if args.postgres_url:
+        from lmmule.rag import Rag, OllamaEmbedding, OpenRouterEmbedding
+
+        embedder = {"ollama": OllamaEmbedding, "openrouter": OpenRouterEmbedding}[
+            args.embedder
+        ](model_name=args.embed_model, embed_dim=args.embed_dim)
+        rag = Rag(postgres_url=args.postgres_url, embedder=embedder, echo=False)
+
+    server = MuleServer(rag=rag, mule_modules=args.mules)
+    web.run_app(server.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import os
+import time
+import contextvars
+from collections import deque
+from dataclasses import dataclass, field
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Span attributes that become metric labels; keep these low cardinality.
+# "mule" is the Mule class; the per-instance mule_name stays on the span only
+LABELS = ("provider", "mule", "model", "namespace")
+# Span attributes that are aggregated into metrics: name -> (type, help)
+MEASURES = {
+    "duration_s": ("histogram", "Operation latency in seconds"),
+    "ttft_s": ("histogram", "Time to first token in seconds"),
+    "load_s": ("histogram", "Model load time in seconds"),
+    "queue_wait_s": ("histogram", "Time spent waiting for a rate limit or worker"),
+    "tokens_per_s": ("summary", "Generated tokens per second"),
+    "tokens_in": ("counter", "Prompt tokens"),
+    "tokens_out": ("counter", "Generated tokens"),
+}
+
+_current: contextvars.ContextVar = contextvars.ContextVar("lmmule_span", default=None)
+
+
+@dataclass
+class Span:
+    telemetry: "Telemetry"
+    name: str
+    attributes: dict
+    trace_id: str = ""
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: str | None = None
+    start_ns: int = 0
+    end_ns: int = 0
+    error: str | None = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name: str, value: float):
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def elapsed(self) -> float:
+        return (time.perf_counter_ns() - self._perf_start) / 1e9
+
+    def fail(self, error):
+        self.error = repr(error)
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is not None and parent is not NOOP_SPAN:
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        else:
+            self.trace_id = os.urandom(16).hex()
+        self.start_ns = time.time_ns()
+        self._perf_start = time.perf_counter_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.attributes["duration_s"] = self.elapsed()
+        self.end_ns = self.start_ns + int(self.attributes["duration_s"] * 1e9)
+        _current.reset(self._token)
+        if exc is not None and self.error is None:
+            self.fail(exc)
+        self.telemetry.record(self)
+        return False
+
+    def to_otel(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": k, "value": _otel_value(v)} for k, v in self.attributes.items()
+            ],
+            "status": (
+                {"code": "STATUS_CODE_ERROR", "message": self.error}
+                if self.error
+                else {"code": "STATUS_CODE_OK"}
+            ),
+        }
+
+
+class _NoopSpan:
+    attributes: dict = {}
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, value):
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def fail(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+UNITS = {
+    "duration_s": "duration_seconds",
+    "ttft_s": "ttft_seconds",
+    "load_s": "load_seconds",
+    "queue_wait_s": "queue_wait_seconds",
+    "tokens_per_s": "tokens_per_second",
+    "tokens_in": "tokens_in_total",
+    "tokens_out": "tokens_out_total",
+}
+
+
+def _metric_name(span_name: str, measure: str) -> str:
+    return f"lmmule_{span_name.replace('.', '_').replace('-', '_')}_{UNITS[measure]}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def prometheus_samples(name: str, type_: str, help_: str, samples: list) -> list[str]:
+    """Format (labels dict, value) samples as Prometheus text lines."""
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} {type_}"]
+    lines += [
+        f"{name}{_labels(tuple(sorted(labels.items())))} {value}"
+        for labels, value in samples
+    ]
+    return lines
+
+
+@dataclass
+class Telemetry:
+    """Records spans for LLM, scrape, embed and Rag operations and aggregates
+    them into metrics. When disabled, span() hands back a shared no-op."""
+
+    enabled: bool = field(
+        default_factory=lambda: os.environ.get("LMMULE_TELEMETRY", "") not in ("", "0")
+    )
+    max_spans: int = 10000
+
+    def __post_init__(self):
+        self.spans: deque[Span] = deque(maxlen=self.max_spans)
+        # (span name, measure, labels) -> [count, sum, bucket counts]
+        self.metrics: dict[tuple[str, str, tuple], list] = {}
+        self.errors: dict[tuple[str, tuple], int] = {}
+
+    def span(self, name: str, **attributes) -> Span | _NoopSpan:
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    @classmethod
+    def current(cls) -> Span | _NoopSpan:
+        return _current.get() or NOOP_SPAN
+
+    def record(self, span: Span):
+        self.spans.append(span)
+        labels = tuple((k, span.attributes[k]) for k in LABELS if k in span.attributes)
+        if span.error:
+            key = (span.name, labels)
+            self.errors[key] = self.errors.get(key, 0) + 1
+        for measure, value in span.attributes.items():
+            if measure not in MEASURES or not isinstance(value, (int, float)):
+                continue
+            agg = self.metrics.setdefault(
+                (span.name, measure, labels),
+                [0, 0.0, [0] * len(BUCKETS)],
+            )
+            agg[0] += 1
+            agg[1] += value
+            if MEASURES[measure][0] == "histogram":
+                for i, bound in enumerate(BUCKETS):
+                    if value <= bound:
+                        agg[2][i] += 1
+
+    def reset(self):
+        self.spans.clear()
+        self.metrics.clear()
+        self.errors.clear()
+
+    def prometheus(self) -> str:
+        lines, seen = [], set()
+        for (span_name, measure, labels), (count, total, buckets) in sorted(
+            self.metrics.items(), key=lambda item: (item[0][:2], str(item[0][2]))
+        ):
+            name = _metric_name(span_name, measure)
+            type_, help_ = MEASURES[measure]
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {help_}", f"# TYPE {name} {type_}"]
+            if type_ == "counter":
+                lines.append(f"{name}{_labels(labels)} {total:g}")
+                continue
+            if type_ == "histogram":
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(
+                        f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {n}"
+                    )
+                lines.append(
+                    f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}"
+                )
+            lines.append(f"{name}_sum{_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        if self.errors:
+            name = "lmmule_errors_total"
+            lines += [f"# HELP {name} Failed operations", f"# TYPE {name} counter"]
+            for (span_name, labels), n in sorted(
+                self.errors.items(), key=lambda item: str(item[0])
+            ):
+                lines.append(f"{name}{_labels((('op', span_name),) + labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def export_spans(self, clear: bool = False) -> dict:
+        """OTLP/JSON shaped trace export of the buffered spans."""
+        spans = [span.to_otel() for span in self.spans]
+        if clear:
+            self.spans.clear()
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": "lmmule"}}
+                        ]
+                    },
+                    "scopeSpans": [{"scope": {"name": "lmmule"}, "spans": spans}],
+                }
+            ]
+        }
+
+
+def ollama_usage(resp: dict, span) -> dict:
+    """Span attributes from the stats Ollama returns with a finished chat.
+    A streamed call has already measured its own ttft_s."""
+    usage = {}
+    if "prompt_eval_count" in resp:
+        usage["tokens_in"] = resp["prompt_eval_count"]
+    if "eval_count" in resp:
+        usage["tokens_out"] = resp["eval_count"]
+    if resp.get("load_duration"):
+        usage["load_s"] = resp["load_duration"] / 1e9
+    if resp.get("eval_count") and resp.get("eval_duration"):
+        usage["tokens_per_s"] = resp["eval_count"] / (resp["eval_duration"] / 1e9)
+    if (
+        "ttft_s" not in span.attributes
+        and "load_duration" in resp
+        and "prompt_eval_duration" in resp
+    ):
+        usage["ttft_s"] = (resp["load_duration"] + resp["prompt_eval_duration"]) / 1e9
+    return usage
+
+
+def openrouter_usage(resp: dict, span) -> dict:
+    usage = {}
+    if u := resp.get("usage"):
+        usage["tokens_in"] = u.get("prompt_tokens", 0)
+        usage["tokens_out"] = u.get("completion_tokens", 0)
+        generating = span.elapsed() - span.attributes.get("ttft_s", 0)
+        if usage["tokens_out"] and generating > 0:
+            usage["tokens_per_s"] = usage["tokens_out"] / generating
+    return usage
+
+
+TELEMETRY = Telemetry()
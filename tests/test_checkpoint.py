@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import lmmule.mule
+from lmmule.mule import Mule
+from lmmule.checkpoint import Checkpoint
+
+CALLS: list[str] = []
+
+
+class Echo(Mule):
+    async def __call__(self, **depends_on):
+        CALLS.append(self.mule_name)
+        return await self.llm_call(self.base_prompt)
+
+    async def llm_call(self, prompt: str) -> list[dict]:
+        self.chat_history += [
+            {"role": "user", "content": prompt},
+            {"role": "system", "content": f"echo {prompt}"},
+        ]
+        return self.chat_history
+
+
+@pytest.fixture
+def checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(lmmule.mule, "USE_REMOTE", False)
+    monkeypatch.setattr(lmmule.mule, "CHECKPOINT", Checkpoint(root=str(tmp_path)))
+    CALLS.clear()
+    return lmmule.mule.CHECKPOINT
+
+
+def test_unchanged_mule_is_reused(checkpoint):
+    first = asyncio.run(Echo("a", "m", base_prompt="hi")())
+    second = asyncio.run(Echo("a", "m", base_prompt="hi")())
+    assert first == second
+    assert CALLS == ["a"]
+    assert checkpoint.hits == 1
+
+
+def test_prompt_change_invalidates(checkpoint):
+    asyncio.run(Echo("a", "m", base_prompt="hi")())
+    asyncio.run(Echo("a", "m", base_prompt="bye")())
+    assert CALLS == ["a", "a"]
+
+
+def test_provider_is_part_of_the_key(checkpoint, monkeypatch):
+    asyncio.run(Echo("a", "m", base_prompt="hi")())
+    monkeypatch.setattr(lmmule.mule, "USE_REMOTE", True)
+    asyncio.run(Echo("a", "m", base_prompt="hi")())
+    assert CALLS == ["a", "a"]
+
+
+def test_seeded_history_is_part_of_the_key(checkpoint):
+    asyncio.run(Echo("a", "m", base_prompt="hi")())
+    seeded = Echo(
+        "a", "m", base_prompt="hi", chat_history=[{"role": "user", "content": "ctx"}]
+    )
+    result = asyncio.run(seeded())
+    assert CALLS == ["a", "a"]
+    assert result[0]["content"] == "ctx"
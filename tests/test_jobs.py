@@ -0,0 +1,166 @@
+import time
+import asyncio
+from dataclasses import dataclass, field
+
+import pytest
+
+from lmmule.mule import Mule
+from lmmule.jobs import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    PENDING,
+    RUNNING,
+    JobQueue,
+    TaskFailed,
+    Worker,
+    dump_mule,
+    load_mule,
+)
+
+pytest.importorskip("aiosqlite")
+
+FAILURES: dict[str, int] = {}
+
+
+class Echo(Mule):
+    async def __call__(self, **depends_on):
+        return [
+            {"role": "user", "content": self.base_prompt},
+            {"role": "system", "content": f"echo {self.base_prompt}"},
+        ]
+
+
+class Flaky(Mule):
+    """Fails the first `topics` attempts, counted per mule_name."""
+
+    async def __call__(self, **depends_on):
+        FAILURES[self.mule_name] = FAILURES.get(self.mule_name, 0) + 1
+        if FAILURES[self.mule_name] <= int(self.topics):
+            raise ValueError("flaky")
+        return [{"role": "system", "content": "ok"}]
+
+
+@dataclass
+class Tagged(Echo):
+    tags: set[str] = field(default_factory=set)
+    depth: int = 1
+
+
+def run(coro_fn, tmp_path, **kwargs):
+    async def main():
+        queue = await JobQueue(
+            f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}", **kwargs
+        ).init_db()
+        try:
+            return await coro_fn(queue)
+        finally:
+            await queue.close()
+
+    return asyncio.run(main())
+
+
+def test_claim_complete(tmp_path):
+    async def check(queue):
+        task_id = await queue.submit(Echo("a", "m", base_prompt="hi"))
+        task = await queue.claim("w1")
+        assert (task.id, task.status, task.attempts) == (task_id, RUNNING, 1)
+        assert await queue.claim("w2") is None
+
+        await queue.complete(task_id, "w1", [{"role": "system", "content": "x"}])
+        assert (await queue.status(task_id))["status"] == DONE
+        assert await queue.result(task_id) == [{"role": "system", "content": "x"}]
+
+    run(check, tmp_path)
+
+
+def test_fail_retries_then_fails(tmp_path):
+    async def check(queue):
+        task_id = await queue.submit(Echo("a", "m"), max_attempts=2)
+
+        await queue.fail(await queue.claim("w1"), "w1", "boom")
+        status = await queue.status(task_id)
+        assert (status["status"], status["attempts"]) == (PENDING, 1)
+
+        task = await queue.claim("w1")
+        assert task.attempts == 2
+        await queue.fail(task, "w1", "boom again")
+        assert (await queue.status(task_id))["status"] == FAILED
+        with pytest.raises(TaskFailed):
+            await queue.result(task_id)
+
+    run(check, tmp_path, retry_delay=0)
+
+
+def test_cancel_cascades_to_dependants(tmp_path):
+    async def check(queue):
+        upstream = await queue.submit(Echo("a", "m"))
+        middle = await queue.submit(Echo("b", "m"), prior1=upstream)
+        leaf = await queue.submit(Echo("c", "m"), prior1=middle)
+
+        assert await queue.cancel(upstream)
+        # no worker sweep needed
+        assert (await queue.status(middle))["status"] == CANCELLED
+        with pytest.raises(TaskFailed):
+            await queue.result(leaf, timeout=1)
+        assert await queue.claim("w1") is None
+
+    run(check, tmp_path)
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    async def check(queue):
+        task_id = await queue.submit(Echo("a", "m"))
+        assert (await queue.claim("w1")).id == task_id
+        await asyncio.sleep(0.1)
+
+        task = await queue.claim("w2")
+        assert (task.id, task.worker, task.attempts) == (task_id, "w2", 2)
+        assert not await queue.heartbeat(task_id, "w1")
+        # the stale worker can no longer complete it
+        await queue.complete(task_id, "w1", [{"role": "system", "content": "w1"}])
+        assert (await queue.status(task_id))["status"] == RUNNING
+
+        await queue.complete(task_id, "w2", [{"role": "system", "content": "w2"}])
+        assert (await queue.result(task_id))[-1]["content"] == "w2"
+
+    run(check, tmp_path, lease_seconds=0.05)
+
+
+def test_idle_worker_waits_for_retries(tmp_path):
+    async def check(queue):
+        task_id = await queue.submit(Flaky("flaky-idle", "m", topics="1"))
+        start = time.monotonic()
+        await asyncio.wait_for(Worker(queue).run(stop_when_idle=True), 10)
+
+        status = await queue.status(task_id)
+        assert (status["status"], status["attempts"]) == (DONE, 2)
+        assert time.monotonic() - start >= queue.retry_delay
+
+    run(check, tmp_path, retry_delay=0.3, poll_interval=0.05)
+
+
+def test_dump_load_keeps_subclass_fields():
+    mule = Tagged("a", "m", tags={"y", "x"}, depth=3, on_token=print)
+    path, args = dump_mule(mule)
+    assert path.endswith("test_jobs:Tagged")
+    assert args["tags"] == ["x", "y"]
+    assert "on_token" not in args
+
+    loaded = load_mule(path, args)
+    assert (loaded.tags, loaded.depth, loaded.on_token) == ({"x", "y"}, 3, None)
+    assert loaded.search_allowed_tags == mule.search_allowed_tags
+
+
+def test_submit_rejects_unimportable_mules(tmp_path):
+    Main = type("Main", (Echo,), {"__module__": "__main__"})
+
+    class Local(Echo):
+        pass
+
+    async def check(queue):
+        for cls in (Main, Local):
+            with pytest.raises(ValueError, match="importable module"):
+                await queue.submit(cls("a", "m"))
+
+    run(check, tmp_path)
@@ -0,0 +1,167 @@
+import time
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import lmmule.mule
+from lmmule.mule import Multils
+from lmmule.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(max_retries=2, backoff_base=0)
+    monkeypatch.setattr(lmmule.mule, "LIMITER", limiter)
+    return limiter
+
+
+def test_bucket_wait_time(clock):
+    bucket = TokenBucket(rate=2, capacity=2, updated=clock[0])
+    assert bucket.wait_time() == 0
+
+    bucket.tokens -= 2
+    assert bucket.wait_time() == 0.5
+    clock[0] += 0.25
+    assert bucket.wait_time() == 0.25
+    clock[0] += 10
+    assert bucket.wait_time() == 0
+    assert bucket.tokens == 2  # refill is capped
+
+    bucket.block_for(3)
+    assert bucket.wait_time() == 3
+    bucket.sync_remaining(0)
+    clock[0] += 3
+    assert bucket.tokens == 0
+    assert bucket.wait_time() == 0
+
+
+def test_only_free_models_are_limited_by_default():
+    limiter = RateLimiter()
+    assert limiter._bucket("openrouter", None) is None
+    assert limiter._bucket("openrouter", "some/model") is None
+    assert limiter._bucket("openrouter", "some/model:free") is not None
+
+    limiter.configure("openrouter", rate=1, burst=3)
+    assert limiter._bucket("openrouter", None).capacity == 3
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, None),
+        ({"Retry-After": "2"}, 2),
+        ({"Retry-After": "-1"}, 0),
+        ({"Retry-After": "soon"}, None),
+        (
+            {
+                "Retry-After": format_datetime(
+                    datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True
+                )
+            },
+            pytest.approx(30, abs=2),
+        ),
+    ],
+)
+def test_retry_after(headers, expected):
+    assert RateLimiter.retry_after(headers) == expected
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, None),
+        ("soon", None),
+        ("5", 5),  # seconds from now
+        (str(int((time.time() + 10) * 1000)), pytest.approx(10, abs=2)),  # epoch ms
+        (str(time.time() + 10), pytest.approx(10, abs=2)),  # epoch seconds
+        (str(int((time.time() - 10) * 1000)), 0),
+    ],
+)
+def test_reset_after(value, expected):
+    headers = {} if value is None else {"X-RateLimit-Reset": value}
+    assert RateLimiter.reset_after(headers) == expected
+
+
+def test_update():
+    limiter = RateLimiter(max_retries=1)
+    assert limiter.update("p", "m", 400, {}, attempt=0) is None
+    assert limiter.update("p", "m", 429, {"Retry-After": "3"}, attempt=0) == 3
+    assert limiter.update("p", "m", 503, {}, attempt=1) is None
+    stats = limiter.stats_for("p", "m")
+    assert (stats.retried, stats.throttled, stats.failed) == (1, 1, 1)
+
+
+def serve_statuses(*statuses):
+    """Run `check(url, calls)` against a server answering with `statuses` in
+    turn, then 200."""
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        if len(calls) <= len(statuses):
+            return web.Response(
+                status=statuses[len(calls) - 1],
+                text="slow down",
+                headers={"Retry-After": "0"},
+            )
+        return web.json_response({"ok": True})
+
+    def run(check):
+        async def main():
+            app = web.Application()
+            app.router.add_post("/", handler)
+            async with TestServer(app) as server:
+                return await check(str(server.make_url("/")))
+
+        asyncio.run(main())
+        return calls
+
+    return run
+
+
+def test_response_retries_until_success(limiter):
+    async def check(url):
+        result = await Multils.request("post", url, payload={}, limit=("p", "m"))
+        assert result == {"ok": True}
+
+    calls = serve_statuses(429, 503)(check)
+    assert len(calls) == 3
+    stats = limiter.stats_for("p", "m")
+    assert (stats.retried, stats.throttled, stats.failed) == (2, 1, 0)
+
+
+def test_response_gives_up_after_max_retries(limiter):
+    async def check(url):
+        result = await Multils.request("post", url, payload={}, limit=("p", "m"))
+        assert result == {"error": "slow down"}
+
+    calls = serve_statuses(429, 429, 429, 429)(check)
+    assert len(calls) == limiter.max_retries + 1
+    assert limiter.stats_for("p", "m").failed == 1
+
+
+def test_response_without_limit_is_not_retried(limiter):
+    async def check(url):
+        assert await Multils.request("post", url, payload={}) == {"error": "slow down"}
+
+    assert len(serve_statuses(429)(check)) == 1
+
+
+def test_connection_errors_are_retried_then_returned(limiter):
+    result = asyncio.run(
+        Multils.request("post", "http://127.0.0.1:1/", payload={}, limit=("p", "m"))
+    )
+    assert "error" in result
+    stats = limiter.stats_for("p", "m")
+    assert (stats.retried, stats.failed) == (2, 1)
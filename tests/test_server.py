@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import lmmule.mule
+from lmmule.server import MuleServer
+from lmmule.telemetry import TELEMETRY
+from lmmule.bench.stubs import StubLLM
+
+
+class FakeRag:
+    """Only what MuleServer touches; validation runs before search."""
+
+    async def init_db(self):
+        return self
+
+    async def close(self):
+        pass
+
+    async def search(self, query, **kwargs):
+        return [{"text": query, **kwargs}]
+
+
+def node(mule="Thinker", **spec):
+    return {"mule": mule, "model_name": "m", "base_prompt": "hi", **spec}
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(lmmule.mule, "USE_REMOTE", False)
+    # restored after the test; serve() points it at the stub
+    monkeypatch.setattr(lmmule.mule, "OLLAMA_URL", lmmule.mule.OLLAMA_URL)
+
+    def serve(check, latency: float = 0.01, rag=None, ollama_url: str | None = None):
+        async def main():
+            stub = TestServer(
+                StubLLM(latency=latency, tokens_per_s=1000, output_tokens=5).app()
+            )
+            await stub.start_server()
+            lmmule.mule.OLLAMA_URL = ollama_url or str(stub.make_url("/ollama"))
+            server = MuleServer(rag=rag)
+            try:
+                async with TestClient(TestServer(server.app())) as client:
+                    return await check(client, server)
+            finally:
+                await stub.close()
+
+        return asyncio.run(main())
+
+    return serve
+
+
+@pytest.mark.parametrize(
+    "nodes, error",
+    [
+        ({"a": "x"}, "node spec must be an object"),
+        ({"a": node(depends_on={"prior1": "nope"})}, "unknown node 'nope'"),
+        (
+            {
+                "a": node(depends_on={"prior1": "b"}),
+                "b": node(depends_on={"prior1": "a"}),
+            },
+            "dependency cycle",
+        ),
+        ({"a": node(depends_on=["b"])}, "depends_on must map"),
+        ({"a": node(mule="Mule")}, "mule must be one of"),
+        ({"a": node(base_prompt=3)}, "base_prompt must be a string"),
+        ({}, "'nodes' must be a non-empty object"),
+    ],
+)
+def test_bad_flows_are_rejected(serve, nodes, error):
+    async def check(client, server):
+        resp = await client.post("/flows", json={"nodes": nodes})
+        assert resp.status == 400
+        assert error in await resp.text()
+
+    serve(check)
+
+
+def test_wait_runs_flow_to_completion(serve):
+    async def check(client, server):
+        nodes = {
+            "a": node(),
+            "b": node("Critic", base_prompt="judge {}", depends_on={"prior1": "a"}),
+        }
+        resp = await client.post("/flows?wait=1", json={"nodes": nodes})
+        assert resp.status == 200
+        flow = await resp.json()
+        assert flow["status"] == "done"
+        assert flow["results"]["b"][-1]["role"] == "system"
+
+        events = await (await client.get(f"/flows/{flow['id']}/events")).text()
+        assert events.count("event: node_done") == 2
+        assert events.rstrip().split("\n")[-2] == "event: done"
+
+    serve(check)
+
+
+def test_metrics_are_labelled_by_mule_class(serve, monkeypatch):
+    monkeypatch.setattr(TELEMETRY, "enabled", True)
+    TELEMETRY.reset()
+
+    async def check(client, server):
+        nodes = {"node-a": node(), "node-b": node()}
+        await client.post("/flows?wait=1", json={"nodes": nodes})
+        metrics = await (await client.get("/metrics")).text()
+        assert 'mule="Thinker"' in metrics
+        assert "node-a" not in metrics
+        spans = TELEMETRY.export_spans(clear=True)["resourceSpans"][0]
+        names = {
+            a["value"]["stringValue"]
+            for span in spans["scopeSpans"][0]["spans"]
+            for a in span["attributes"]
+            if a["key"] == "mule_name"
+        }
+        assert names == {"node-a", "node-b"}
+
+    try:
+        serve(check)
+    finally:
+        TELEMETRY.reset()
+
+
+def test_provider_failure_fails_flow(serve):
+    async def check(client, server):
+        resp = await client.post("/flows?wait=1", json={"nodes": {"a": node()}})
+        flow = await resp.json()
+        assert flow["status"] == "failed"
+        assert "no response" in flow["error"]
+        assert server.counters["flow_errors"] == 1
+
+    serve(check, ollama_url="http://127.0.0.1:1")
+
+
+def test_identical_inflight_flows_are_coalesced(serve):
+    async def check(client, server):
+        body = {"nodes": {"a": node()}}
+        first, second = await asyncio.gather(
+            client.post("/flows", json=body), client.post("/flows", json=body)
+        )
+        assert (await first.json())["id"] == (await second.json())["id"]
+        assert server.counters["flows"] == 1
+        assert server.counters["coalesced"] == 1
+
+    serve(check, latency=0.3)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"query": 3},
+        {"query": "x", "top_k": "5"},
+        {"query": "x", "top_k": 0},
+        {"query": "x", "threshold": "0.5"},
+        {"query": "x", "namespace": ["a"]},
+    ],
+)
+def test_bad_rag_search_is_rejected(serve, body):
+    async def check(client, server):
+        resp = await client.post("/rag/search", json=body)
+        assert resp.status == 400
+
+    serve(check, rag=FakeRag())
+
+
+def test_rag_search(serve):
+    async def check(client, server):
+        resp = await client.post("/rag/search", json={"query": "x", "top_k": 2})
+        assert resp.status == 200
+        assert await resp.json() == [{"text": "x", "top_k": 2}]
+
+    serve(check, rag=FakeRag())